@@ -1,8 +1,10 @@
+import contextlib
 import functools
 import itertools
 import sys
+import threading
 from signal import SIGINT, default_int_handler, signal
-from typing import Any, Callable, Iterator, Optional, Tuple
+from typing import Any, Callable, ContextManager, Iterator, Optional, Tuple
 
 from pip._vendor.progress.bar import Bar, FillingCirclesBar, IncrementalBar
 from pip._vendor.progress.spinner import Spinner
@@ -319,3 +321,88 @@ def get_download_progress_renderer(
         return iter  # no-op, when passed an iterator
     else:
         return _legacy_progress_bar(bar_type, size)
+
+
+#
+# Combined progress display for concurrent downloads.
+#
+class BatchDownloadProgress:
+    """Aggregate progress of several downloads running in worker threads.
+
+    Workers report the size of every chunk they write and signal when a
+    file is complete; a single display is updated under a lock instead of
+    rendering one bar per file.
+    """
+
+    def __init__(
+        self, count: int, update: Callable[[int, int], None] = lambda f, b: None
+    ) -> None:
+        self.count = count
+        self.completed = 0
+        self.downloaded = 0
+        self._update = update
+        self._lock = threading.Lock()
+
+    def advance(self, size: int) -> None:
+        with self._lock:
+            self.downloaded += size
+            self._update(self.completed, self.downloaded)
+
+    def file_done(self) -> None:
+        with self._lock:
+            self.completed += 1
+            self._update(self.completed, self.downloaded)
+
+
+@contextlib.contextmanager
+def _rich_batch_progress(count: int) -> Iterator[BatchDownloadProgress]:
+    columns: Tuple[ProgressColumn, ...] = (
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed}/{task.total} files"),
+        TextColumn("{task.fields[downloaded]}"),
+        TimeElapsedColumn(),
+    )
+    progress = Progress(*columns, refresh_per_second=30)
+    task_id = progress.add_task(
+        " " * (get_indentation() + 2), total=count, downloaded=format_size(0)
+    )
+
+    def update(completed: int, downloaded: int) -> None:
+        progress.update(
+            task_id, completed=completed, downloaded=format_size(downloaded)
+        )
+
+    with progress:
+        yield BatchDownloadProgress(count, update)
+
+
+@contextlib.contextmanager
+def _legacy_batch_progress(
+    progress_bar: str, count: int
+) -> Iterator[BatchDownloadProgress]:
+    bar = BAR_TYPES[progress_bar][0](max=count)
+
+    def update(completed: int, downloaded: int) -> None:
+        if completed > bar.index:
+            bar.next(completed - bar.index)
+
+    try:
+        yield BatchDownloadProgress(count, update)
+    finally:
+        bar.finish()
+
+
+def get_batch_download_progress_renderer(
+    *, bar_type: str, count: int
+) -> ContextManager[BatchDownloadProgress]:
+    """Get a context manager rendering one display for ``count`` downloads.
+
+    The managed BatchDownloadProgress is safe to share between threads.
+    """
+    if bar_type == "on":
+        return _rich_batch_progress(count)
+    elif bar_type == "off":
+        return contextlib.nullcontext(BatchDownloadProgress(count))
+    else:
+        return _legacy_batch_progress(bar_type, count)
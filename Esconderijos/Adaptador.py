@@ -45,14 +45,17 @@ class CacheControlAdapter(HTTPAdapter):
         cacheable = cacheable_methods or self.cacheable_methods
         if request.method in cacheable:
             try:
-                cached_response = self.controller.cached_request(request)
+                cached_response, conditional_headers = self.controller.lookup(request)
             except zlib.error:
-                cached_response = None
+                cached_response, conditional_headers = None, None
             if cached_response:
                 return self.build_response(request, cached_response, from_cache=True)
 
-            # check for etags and add headers if appropriate
-            request.headers.update(self.controller.conditional_headers(request))
+            # check for etags and add headers if appropriate, reusing the
+            # entry already read by the lookup
+            if conditional_headers is None:
+                conditional_headers = self.controller.conditional_headers(request)
+            request.headers.update(conditional_headers)
 
         return super(CacheControlAdapter, self).send(request, **kw)
 
@@ -9,8 +9,40 @@ safe in-memory dictionary.
 from threading import Lock
 
 
+class CacheStats(object):
+    """Hit, miss and eviction counters of a cache."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def record_evictions(self, count=1):
+        with self.lock:
+            self.evictions += count
+
+    def as_dict(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
 class BaseCache(object):
 
+    @property
+    def stats(self):
+        """The CacheStats of this cache, created on first access."""
+        try:
+            return self.__dict__["_stats"]
+        except KeyError:
+            return self.__dict__.setdefault("_stats", CacheStats())
+
     def get(self, key):
         raise NotImplementedError()
 
@@ -24,6 +56,24 @@ class BaseCache(object):
         pass
 
 
+class SeparateBodyBaseCache(BaseCache):
+    """
+    A cache storing response bodies apart from the cache entries.
+
+    Bodies are written from, and read back as, file objects, so large
+    responses are streamed instead of being held in memory several times.
+    """
+
+    def set_body(self, key, body):
+        raise NotImplementedError()
+
+    def get_body(self, key):
+        """
+        Return the body as file-like object, or None if it is not cached.
+        """
+        raise NotImplementedError()
+
+
 class DictCache(BaseCache):
 
     def __init__(self, init_dict=None):
@@ -31,7 +81,9 @@ class DictCache(BaseCache):
         self.data = init_dict or {}
 
     def get(self, key):
-        return self.data.get(key, None)
+        value = self.data.get(key, None)
+        self.stats.record(value is not None)
+        return value
 
     def set(self, key, value, expires=None):
         with self.lock:
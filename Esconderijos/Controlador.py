@@ -5,15 +5,19 @@
 """
 The httplib2 algorithms ported for use with requests.
 """
+import io
+import json
 import logging
 import re
 import calendar
 import time
+import uuid
 from email.utils import parsedate_tz
 
 from pip._vendor.requests.structures import CaseInsensitiveDict
 
-from .cache import DictCache
+from .cache import DictCache, SeparateBodyBaseCache
+from .compat import HTTPResponse
 from .serialize import Serializer
 
 
@@ -23,6 +27,76 @@ URI = re.compile(r"^(([^:/?#]+):)?(//([^/?#]*))?([^?#]*)(\?([^#]*))?(#(.*))?")
 
 PERMANENT_REDIRECT_STATUSES = (301, 308)
 
+CONTENT_RANGE = re.compile(r"^\s*bytes\s+(\d+)-(\d+)/(\d+|\*)\s*$")
+BYTERANGES_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+
+# Partial-content headers that describe one particular response and must
+# not be replayed on responses assembled from cached segments.
+RANGE_EXCLUDED_HEADERS = ("content-range", "content-length", "content-type")
+
+
+def parse_range(value, length):
+    """Parse a Range header into inclusive (start, end) intervals.
+
+    Returns None for anything but a satisfiable "bytes" range set.
+    """
+    unit, _, ranges = value.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    intervals = []
+    for spec in ranges.split(","):
+        first, sep, last = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                start, end = max(0, length - int(last)), length - 1
+            else:
+                start = int(first)
+                end = min(int(last), length - 1) if last else length - 1
+        except ValueError:
+            return None
+        if start > end:
+            return None
+        intervals.append((start, end))
+    return intervals
+
+
+def iter_byteranges(response, body):
+    """Yield (start, end, total, data) for each part of a 206 response."""
+    content_type = response.headers.get("content-type", "")
+    if not content_type.startswith("multipart/byteranges"):
+        match = CONTENT_RANGE.match(response.headers.get("content-range", ""))
+        if match:
+            start, end, total = match.groups()
+            yield int(start), int(end), total, body
+        return
+
+    match = BYTERANGES_BOUNDARY.search(content_type)
+    if not match:
+        return
+    delimiter = b"--" + match.group(1).encode("ascii")
+    pos = body.find(delimiter)
+    while pos != -1 and body[pos + len(delimiter):pos + len(delimiter) + 2] != b"--":
+        headers_end = body.find(b"\r\n\r\n", pos)
+        if headers_end == -1:
+            return
+        headers = body[pos + len(delimiter):headers_end].decode("latin-1")
+        match = None
+        for line in headers.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-range":
+                match = CONTENT_RANGE.match(value)
+        if not match:
+            return
+        start, end, total = match.groups()
+        start, end = int(start), int(end)
+        data_start = headers_end + 4
+        data_end = data_start + end - start + 1
+        yield start, end, total, body[data_start:data_end]
+        pos = body.find(delimiter, data_end)
+
 
 def parse_uri(uri):
     """Parses a URI using the regex given in Appendix B of RFC 3986.
@@ -128,6 +202,18 @@ class CacheController(object):
         Return a cached response if it exists in the cache, otherwise
         return False.
         """
+        return self.lookup(request)[0]
+
+    def lookup(self, request):
+        """
+        Return a fresh cached response or False, and the conditional
+        headers to revalidate a stale entry with, or None if they still
+        have to be computed with conditional_headers().
+
+        The entry is read from the cache once, and freshness and validators
+        are taken from its metadata, so the body of a stale entry is never
+        loaded.
+        """
         cache_url = self.cache_url(request.url)
         logger.debug('Looking up "%s" in the cache', cache_url)
         cc = self.parse_cache_control(request.headers)
@@ -135,23 +221,48 @@ class CacheController(object):
         # Bail out if the request insists on fresh data
         if "no-cache" in cc:
             logger.debug('Request header has "no-cache", cache bypassed')
-            return False
+            return False, None
 
         if "max-age" in cc and cc["max-age"] == 0:
             logger.debug('Request header has "max_age" as 0, cache bypassed')
-            return False
+            return False, None
+
+        # Range requests are only ever answered from cached segments, never
+        # from a full response which may belong to another representation.
+        if "range" in request.headers:
+            return self.cached_range_request(request), {}
 
         # Request allows serving from the cache, let's see if we find something
         cache_data = self.cache.get(cache_url)
         if cache_data is None:
             logger.debug("No cache entry available")
-            return False
-
-        # Check whether it can be deserialized
-        resp = self.serializer.loads(request, cache_data)
-        if not resp:
+            return False, {}
+
+        # Check whether it can be deserialized, decoding only the metadata
+        # if the entry format allows it.
+        resp = None
+        meta = self.serializer.loads_metadata(request, cache_data)
+        if meta is None:
+            resp = self._load(request, cache_url, cache_data)
+        if not (meta or resp):
             logger.warning("Cache entry deserialization failed, entry ignored")
-            return False
+            return False, {}
+        if resp is not None:
+            status, headers = resp.status, CaseInsensitiveDict(resp.headers)
+        else:
+            status = meta["response"]["status"]
+            headers = CaseInsensitiveDict(meta["response"]["headers"])
+
+        def fresh_response():
+            if resp is not None:
+                return resp
+            return self._load(request, cache_url, cache_data) or False
+
+        def not_fresh(validators):
+            # Don't leak the body file of a response we don't return.
+            if resp is not None:
+                resp.close()
+            return False, validators
 
         # If we have a cached permanent redirect, return it immediately. We
         # don't need to test our response for other headers b/c it is
@@ -162,35 +273,30 @@ class CacheController(object):
         #
         # Client can try to refresh the value by repeating the request
         # with cache busting headers as usual (ie no-cache).
-        if int(resp.status) in PERMANENT_REDIRECT_STATUSES:
+        if int(status) in PERMANENT_REDIRECT_STATUSES:
             msg = (
                 "Returning cached permanent redirect response "
                 "(ignoring date and etag information)"
             )
             logger.debug(msg)
-            return resp
+            return fresh_response(), {}
 
-        headers = CaseInsensitiveDict(resp.headers)
         if not headers or "date" not in headers:
             if "etag" not in headers:
                 # Without date or etag, the cached response can never be used
                 # and should be deleted.
                 logger.debug("Purging cached response: no date or etag")
                 self.cache.delete(cache_url)
+                return not_fresh({})
             logger.debug("Ignoring cached response: no date")
-            return False
+            return not_fresh(self._validator_headers(headers))
 
         now = time.time()
         date = calendar.timegm(parsedate_tz(headers["date"]))
         current_age = max(0, now - date)
         logger.debug("Current age based on date: %i", current_age)
 
-        # TODO: There is an assumption that the result will be a
-        #       urllib3 response object. This may not be best since we
-        #       could probably avoid instantiating or constructing the
-        #       response until we know we need it.
         resp_cc = self.parse_cache_control(headers)
-
         # determine freshness
         freshness_lifetime = 0
 
@@ -225,29 +331,233 @@ class CacheController(object):
         if freshness_lifetime > current_age:
             logger.debug('The response is "fresh", returning cached response')
             logger.debug("%i > %i", freshness_lifetime, current_age)
-            return resp
+            return fresh_response(), {}
 
         # we're not fresh. If we don't have an Etag, clear it out
         if "etag" not in headers:
             logger.debug('The cached response is "stale" with no etag, purging')
             self.cache.delete(cache_url)
+            return not_fresh({})
+
+        # return the original handler, with the validators of the entry
+        return not_fresh(self._validator_headers(headers))
 
-        # return the original handler
-        return False
+    @staticmethod
+    def range_validator(headers):
+        """Return the strong ETag identifying a representation, if any.
+
+        Weak validators cannot be used with If-Range (RFC 7233, 3.2), so
+        partial responses are only cached and served under strong ones.
+        """
+        etag = headers.get("etag")
+        if etag and etag.startswith('"'):
+            return etag
+        return None
+
+    def _range_index_key(self, cache_url, validator):
+        return "{0}\0range-index\0{1}".format(cache_url, validator)
+
+    def _range_segment_key(self, cache_url, validator, start, end):
+        return "{0}\0range\0{1}\0{2}-{3}".format(cache_url, validator, start, end)
+
+    def _load_range_index(self, key):
+        data = self.cache.get(key)
+        if not data:
+            return None
+        try:
+            return json.loads(bytes(data).decode("utf8"))
+        except ValueError:
+            return None
+
+    def cached_range_request(self, request):
+        """Return a 206 response assembled from cached segments, or False.
+
+        Segments are keyed by URL, validator and byte range; a request is
+        only served if it names the validator in If-Range, which pins the
+        representation and makes the segments valid regardless of age.
+        """
+        validator = request.headers.get("if-range", "")
+        if not validator.startswith('"'):
+            logger.debug("Range request without a strong If-Range, not cached")
+            return False
+
+        cache_url = self.cache_url(request.url)
+        index = self._load_range_index(self._range_index_key(cache_url, validator))
+        if index is None:
+            logger.debug("No cached segments available")
+            return False
+
+        intervals = parse_range(request.headers["range"], index["length"])
+        if not intervals:
+            return False
+
+        segments = sorted(index["segments"])
+        parts = []
+        for start, end in intervals:
+            chunks = []
+            pos = start
+            while pos <= end:
+                covering = [s for s in segments if s[0] <= pos <= s[1]]
+                if not covering:
+                    logger.debug("Requested range is not fully cached")
+                    return False
+                seg_start, seg_end = max(covering, key=lambda s: s[1])
+                data = self.cache.get(
+                    self._range_segment_key(cache_url, validator, seg_start, seg_end)
+                )
+                if data is None:
+                    return False
+                stop = min(seg_end, end)
+                chunks.append(bytes(data[pos - seg_start:stop - seg_start + 1]))
+                pos = stop + 1
+            parts.append((start, end, b"".join(chunks)))
+
+        headers = CaseInsensitiveDict(index["headers"])
+        length = index["length"]
+        if len(parts) == 1:
+            start, end, body = parts[0]
+            headers["Content-Range"] = "bytes {0}-{1}/{2}".format(start, end, length)
+            if index.get("content_type"):
+                headers["Content-Type"] = index["content_type"]
+        else:
+            boundary = uuid.uuid4().hex
+            headers["Content-Type"] = "multipart/byteranges; boundary=" + boundary
+            buf = io.BytesIO()
+            for start, end, data in parts:
+                buf.write("--{0}\r\n".format(boundary).encode("ascii"))
+                if index.get("content_type"):
+                    buf.write(
+                        "Content-Type: {0}\r\n".format(index["content_type"]).encode(
+                            "latin-1"
+                        )
+                    )
+                buf.write(
+                    "Content-Range: bytes {0}-{1}/{2}\r\n\r\n".format(
+                        start, end, length
+                    ).encode("ascii")
+                )
+                buf.write(data)
+                buf.write(b"\r\n")
+            buf.write("--{0}--\r\n".format(boundary).encode("ascii"))
+            body = buf.getvalue()
+        headers["Content-Length"] = str(len(body))
+
+        logger.debug("Returning range response assembled from cached segments")
+        return HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=206,
+            reason="Partial Content",
+            preload_content=False,
+            decode_content=False,
+        )
+
+    def cache_range_response(self, request, response, body):
+        """Store the segments of a 206 response under its validator."""
+        validator = self.range_validator(CaseInsensitiveDict(response.headers))
+        if validator is None or body is None:
+            logger.debug("Partial response without a strong ETag, not cached")
+            return
+
+        cc = self.parse_cache_control(response.headers)
+        cc_req = self.parse_cache_control(request.headers)
+        if "no-store" in cc or "no-store" in cc_req:
+            return
+
+        body = bytes(body)
+        cache_url = self.cache_url(request.url)
+        index_key = self._range_index_key(cache_url, validator)
+        index = self._load_range_index(index_key) or {"segments": []}
+        segments = [tuple(s) for s in index["segments"]]
+
+        stored = False
+        for start, end, total, data in iter_byteranges(response, body):
+            if total == "*" or len(data) != end - start + 1:
+                continue
+            index["length"] = int(total)
+            if any(s[0] <= start and end <= s[1] for s in segments):
+                continue
+            # Drop the segments the new one supersedes.
+            for s in [s for s in segments if start <= s[0] and s[1] <= end]:
+                segments.remove(s)
+                self.cache.delete(self._range_segment_key(cache_url, validator, *s))
+            self.cache.set(
+                self._range_segment_key(cache_url, validator, start, end), data
+            )
+            segments.append((start, end))
+            stored = True
+
+        if not stored:
+            return
+
+        content_type = response.headers.get("content-type", "")
+        if not content_type.startswith("multipart/byteranges"):
+            index["content_type"] = content_type
+        index["headers"] = dict(
+            (k, v)
+            for k, v in response.headers.items()
+            if k.lower() not in RANGE_EXCLUDED_HEADERS
+        )
+        index["segments"] = sorted(segments)
+        logger.debug('Caching %d byte range segments of "%s"', len(segments), cache_url)
+        self.cache.set(index_key, json.dumps(index).encode("utf8"))
+
+    def _load(self, request, cache_url, cache_data):
+        """Deserialize an entry, with its separately stored body if any."""
+        body_file = None
+        if isinstance(self.cache, SeparateBodyBaseCache):
+            body_file = self.cache.get_body(cache_url)
+        resp = self.serializer.loads(request, cache_data, body_file)
+        if not resp and body_file is not None:
+            body_file.close()
+        return resp
+
+    def _cache_set(self, cache_url, request, response, body=None, expires=None):
+        """Store a response, streaming its body apart when the cache can."""
+        if isinstance(self.cache, SeparateBodyBaseCache):
+            # The entry goes last, so it never refers to a missing body.
+            if body is not None:
+                self.cache.set_body(cache_url, body)
+            self.cache.set(
+                cache_url,
+                self.serializer.dumps(request, response, separate_body=True),
+                expires=expires,
+            )
+        else:
+            self.cache.set(
+                cache_url,
+                self.serializer.dumps(request, response, body),
+                expires=expires,
+            )
 
     def conditional_headers(self, request):
+        if "range" in request.headers:
+            # A 304 would refer to the full cached response, not the range.
+            return {}
+
         cache_url = self.cache_url(request.url)
-        resp = self.serializer.loads(request, self.cache.get(cache_url))
+        cache_data = self.cache.get(cache_url)
+        meta = self.serializer.loads_metadata(request, cache_data)
+        if meta:
+            return self._validator_headers(
+                CaseInsensitiveDict(meta["response"]["headers"])
+            )
+        if meta is None:
+            resp = self._load(request, cache_url, cache_data)
+            if resp:
+                resp.close()
+                return self._validator_headers(CaseInsensitiveDict(resp.headers))
+        return {}
+
+    @staticmethod
+    def _validator_headers(headers):
         new_headers = {}
 
-        if resp:
-            headers = CaseInsensitiveDict(resp.headers)
-
-            if "etag" in headers:
-                new_headers["If-None-Match"] = headers["ETag"]
+        if "etag" in headers:
+            new_headers["If-None-Match"] = headers["ETag"]
 
-            if "last-modified" in headers:
-                new_headers["If-Modified-Since"] = headers["Last-Modified"]
+        if "last-modified" in headers:
+            new_headers["If-Modified-Since"] = headers["Last-Modified"]
 
         return new_headers
 
@@ -257,8 +567,12 @@ class CacheController(object):
 
         This assumes a requests Response object.
         """
-        # From httplib2: Don't cache 206's since we aren't going to
-        #                handle byte range requests
+        # Partial responses are stored as segments next to, not instead
+        # of, the full response.
+        if response.status == 206 and "range" in request.headers:
+            self.cache_range_response(request, response, body)
+            return
+
         cacheable_status_codes = status_codes or self.cacheable_status_codes
         if response.status not in cacheable_status_codes:
             logger.debug(
@@ -326,17 +640,13 @@ class CacheController(object):
 
             logger.debug("etag object cached for {0} seconds".format(expires_time))
             logger.debug("Caching due to etag")
-            self.cache.set(
-                cache_url,
-                self.serializer.dumps(request, response, body),
-                expires=expires_time,
-            )
+            self._cache_set(cache_url, request, response, body, expires_time)
 
         # Add to the cache any permanent redirects. We do this before looking
         # that the Date headers.
         elif int(response.status) in PERMANENT_REDIRECT_STATUSES:
             logger.debug("Caching permanent redirect")
-            self.cache.set(cache_url, self.serializer.dumps(request, response, b""))
+            self._cache_set(cache_url, request, response, b"")
 
         # Add to the cache if the response headers demand it. If there
         # is no date header then we can't do anything about expiring
@@ -347,11 +657,7 @@ class CacheController(object):
             if "max-age" in cc and cc["max-age"] > 0:
                 logger.debug("Caching b/c date exists and max-age > 0")
                 expires_time = cc["max-age"]
-                self.cache.set(
-                    cache_url,
-                    self.serializer.dumps(request, response, body),
-                    expires=expires_time,
-                )
+                self._cache_set(cache_url, request, response, body, expires_time)
 
             # If the request can expire, it means we should cache it
             # in the meantime.
@@ -368,10 +674,8 @@ class CacheController(object):
                             expires_time
                         )
                     )
-                    self.cache.set(
-                        cache_url,
-                        self.serializer.dumps(request, response, body=body),
-                        expires=expires_time,
+                    self._cache_set(
+                        cache_url, request, response, body, expires_time
                     )
 
     def update_cached_response(self, request, response):
@@ -383,7 +687,7 @@ class CacheController(object):
         """
         cache_url = self.cache_url(request.url)
 
-        cached_response = self.serializer.loads(request, self.cache.get(cache_url))
+        cached_response = self._load(request, cache_url, self.cache.get(cache_url))
 
         if not cached_response:
             # we didn't have a cached response
@@ -419,7 +723,7 @@ class CacheController(object):
         # we want a 200 b/c we have content via the cache
         cached_response.status = 200
 
-        # update our cache
-        self.cache.set(cache_url, self.serializer.dumps(request, cached_response))
+        # update our cache, a separately stored body is left untouched
+        self._cache_set(cache_url, request, cached_response)
 
         return cached_response
@@ -0,0 +1,121 @@
+"""asyncio front-end of PipSession, for fetching many resources at once.
+"""
+
+import asyncio
+import functools
+import urllib.parse
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pip._vendor.requests.models import Response
+
+from pip._internal.network.session import PipSession
+from pip._internal.network.utils import raise_for_status
+
+# Semaphores limiting the requests in flight, by host.
+_HostLimits = Dict[str, asyncio.Semaphore]
+
+
+class AsyncPipSession:
+    """Make requests through a PipSession from asyncio code.
+
+    Requests go through the wrapped session, so authentication
+    (MultiDomainBasicAuth), HTTP caching (CacheControlAdapter) and trusted
+    hosts behave exactly as for synchronous requests.  The blocking
+    transport runs in a bounded pool of worker threads, which share the
+    session's connection pools, while coroutines wait without blocking the
+    event loop.  The number of requests in flight to a single host is
+    limited by max_per_host.
+    """
+
+    def __init__(
+        self,
+        session: PipSession,
+        max_connections: int = 16,
+        max_per_host: int = 4,
+    ) -> None:
+        self._session = session
+        self._max_per_host = max_per_host
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="pip-async"
+        )
+        # Semaphores belong to an event loop, keep them per running loop, so
+        # that the session can be used from successive asyncio.run() calls.
+        self._host_limits: "weakref.WeakKeyDictionary[Any, _HostLimits]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        netloc = urllib.parse.urlsplit(url).netloc
+        limits = self._host_limits.setdefault(asyncio.get_running_loop(), {})
+        try:
+            return limits[netloc]
+        except KeyError:
+            limit = limits[netloc] = asyncio.Semaphore(self._max_per_host)
+            return limit
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        """Make a request, reading the whole body unless stream=True."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._session.request, method, url, **kwargs)
+        async with self._host_limit(url):
+            return await loop.run_in_executor(self._executor, call)
+
+    async def get(self, url: str, **kwargs: Any) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def fetch_all(
+        self,
+        urls: Iterable[str],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> List[Tuple[str, Response]]:
+        """Fetch all urls concurrently, e.g. project pages or METADATA files.
+
+        Responses are returned in the order of urls; the first HTTP error
+        is raised as NetworkConnectionError once all requests are done.
+        """
+
+        async def fetch(url: str) -> Tuple[str, Response]:
+            resp = await self.get(url, headers=headers)
+            raise_for_status(resp)
+            return url, resp
+
+        results = await asyncio.gather(
+            *(fetch(url) for url in urls), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results  # type: ignore[return-value]
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    async def __aenter__(self) -> "AsyncPipSession":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        # Waiting for the requests in flight would block the event loop.
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+def fetch_all(
+    session: PipSession,
+    urls: Iterable[str],
+    headers: Optional[Dict[str, str]] = None,
+    max_connections: int = 16,
+    max_per_host: int = 4,
+) -> List[Tuple[str, Response]]:
+    """Fetch all urls concurrently, for synchronous callers.
+
+    This runs AsyncPipSession.fetch_all in its own event loop.
+    """
+
+    async def run() -> List[Tuple[str, Response]]:
+        async with AsyncPipSession(
+            session, max_connections=max_connections, max_per_host=max_per_host
+        ) as async_session:
+            return await async_session.fetch_all(urls, headers=headers)
+
+    return asyncio.run(run())
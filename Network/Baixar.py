@@ -1,20 +1,32 @@
 """Download files with progress indicators.
 """
 import cgi
+import hashlib
+import json
 import logging
 import mimetypes
 import os
-from typing import Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
 
+from pip._vendor.requests.exceptions import ChunkedEncodingError
+from pip._vendor.requests.exceptions import ConnectionError as RequestsConnectionError
 from pip._vendor.requests.models import CONTENT_CHUNK_SIZE, Response
+from pip._vendor.urllib3.exceptions import ProtocolError, ReadTimeoutError
 
-from pip._internal.cli.progress_bars import get_download_progress_renderer
+from pip._internal.cli.progress_bars import (
+    BatchDownloadProgress,
+    get_batch_download_progress_renderer,
+    get_download_progress_renderer,
+)
 from pip._internal.exceptions import NetworkConnectionError
 from pip._internal.models.index import PyPI
 from pip._internal.models.link import Link
 from pip._internal.network.cache import is_from_cache
 from pip._internal.network.session import PipSession
 from pip._internal.network.utils import HEADERS, raise_for_status, response_chunks
+from pip._internal.utils.filesystem import adjacent_tmp_file, replace
+from pip._internal.utils.hashes import Hashes
 from pip._internal.utils.misc import format_size, redact_auth_from_url, splitext
 
 logger = logging.getLogger(__name__)
@@ -111,75 +123,372 @@ def _get_http_response_filename(resp: Response, link: Link) -> str:
     return filename
 
 
-def _http_get_download(session: PipSession, link: Link) -> Response:
+class DownloadedFile(Tuple[str, str]):
+    """The (filepath, content_type) pair of a download.
+
+    digests holds the hex digests computed while the file was written, keyed
+    by hash name, so that later stages don't need to hash the file again.
+    """
+
+    digests: Dict[str, str]
+
+    def __new__(
+        cls, filepath: str, content_type: str, digests: Optional[Dict[str, str]] = None
+    ) -> "DownloadedFile":
+        self = super().__new__(cls, (filepath, content_type))  # type: ignore
+        self.digests = digests or {}
+        return self
+
+
+_Hashers = Dict[str, "hashlib._Hash"]
+
+# The journal of a resumable download is updated after this many bytes.
+JOURNAL_INTERVAL = 1024 * 1024
+
+# Errors interrupting a response body, after which a download is resumed.
+_INTERRUPTED_ERRORS = (
+    RequestsConnectionError,
+    ChunkedEncodingError,
+    ProtocolError,
+    ReadTimeoutError,
+)
+
+
+def _new_hashers(hashes: Optional[Hashes]) -> _Hashers:
+    return {name: hashlib.new(name) for name in hashes._allowed} if hashes else {}
+
+
+def _check_digests(
+    hashes: Optional[Hashes], hashers: _Hashers, filepath: str
+) -> Dict[str, str]:
+    """Check hashers fed while filepath was written against hashes.
+
+    This mirrors Hashes.check_against_chunks, but on the data as it was
+    written instead of a second read of the file.  On a mismatch the file is
+    removed and HashMismatch (or HashMissing, for MissingHashes) is raised.
+    """
+    digests = {name: hasher.hexdigest() for name, hasher in hashers.items()}
+    if hashes and not any(
+        hashes.is_hash_allowed(name, digest) for name, digest in digests.items()
+    ):
+        os.remove(filepath)
+        hashes._raise(hashers)
+    return digests
+
+
+def _http_get_download(
+    session: PipSession, link: Link, headers: Optional[Dict[str, str]] = None
+) -> Response:
     target_url = link.url.split("#", 1)[0]
-    resp = session.get(target_url, headers=HEADERS, stream=True)
+    resp = session.get(target_url, headers={**HEADERS, **(headers or {})}, stream=True)
     raise_for_status(resp)
     return resp
 
 
-class Downloader:
-    def __init__(
-        self,
-        session: PipSession,
-        progress_bar: str,
-    ) -> None:
-        self._session = session
-        self._progress_bar = progress_bar
+def _get_content_range_start(resp: Response) -> Optional[int]:
+    content_range = resp.headers.get("Content-Range", "")
+    unit, _, interval = content_range.partition(" ")
+    try:
+        return int(interval.split("-", 1)[0]) if unit == "bytes" else None
+    except ValueError:
+        return None
+
+
+class _PartialDownload:
+    """A partially downloaded file, with a journal allowing to resume it.
+
+    The journal records the URL, the validator (ETag or Last-Modified) of
+    the representation being downloaded and how many bytes of it are safely
+    on disk.
+    """
+
+    def __init__(self, location: str, link: Link) -> None:
+        self._url = link.url_without_fragment
+        # Links sharing a filename, e.g. from different indexes, may be
+        # downloaded into the same location at once.
+        key = hashlib.sha224(self._url.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(location, f"{link.filename}.{key}.part")
+        self._journal_path = self.path + ".json"
+        self.validator: Optional[str] = None
+        self.offset = 0
+
+    def load(self) -> None:
+        """Pick up a partial file left by an earlier run, if any."""
+        try:
+            with open(self._journal_path, encoding="utf-8") as f:
+                journal = json.load(f)
+            size = os.path.getsize(self.path)
+            if journal["url"] == self._url and journal["validator"]:
+                self.validator = journal["validator"]
+                self.offset = min(int(journal["offset"]), size)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self, offset: int, validator: Optional[str]) -> None:
+        """Record that offset bytes of the representation are on disk."""
+        self.offset, self.validator = offset, validator
+        if validator is None:
+            return
+        journal = {"url": self._url, "validator": validator, "offset": offset}
+        with adjacent_tmp_file(self._journal_path) as f:
+            f.write(json.dumps(journal).encode("utf-8"))
+        replace(f.name, self._journal_path)
+
+    def discard(self) -> None:
+        for path in (self.path, self._journal_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def complete(self, filepath: str) -> None:
+        replace(self.path, filepath)
+        try:
+            os.remove(self._journal_path)
+        except FileNotFoundError:
+            pass
+
 
-    def __call__(self, link: Link, location: str) -> Tuple[str, str]:
-        """Download the file given by link into location."""
+def _download(
+    session: PipSession,
+    link: Link,
+    location: str,
+    progress_bar: str,
+    hashes: Optional[Hashes] = None,
+    on_chunk: Optional[Callable[[int], None]] = None,
+    resume_retries: int = 0,
+) -> DownloadedFile:
+    """Download link into location, resuming after interruptions.
+
+    The body is written to a partial file.  If it is interrupted, it is
+    requested again from where it stopped, with a Range request whose
+    If-Range validator ensures the rest belongs to the same file, up to
+    resume_retries times.  If the server sends the whole file, answers with
+    another range or refuses the range (416), the file is downloaded again
+    from the start.  With resumes enabled, the partial file and its journal
+    are kept on failure, so a later download into the same location resumes
+    it as well.
+    """
+    partial = _PartialDownload(location, link)
+    if resume_retries:
+        partial.load()
+    hashers = _new_hashers(hashes)
+    hashed = 0
+    attempts = 0
+    while True:
+        headers = {}
+        if partial.offset and partial.validator:
+            headers["Range"] = f"bytes={partial.offset}-"
+            headers["If-Range"] = partial.validator
         try:
-            resp = _http_get_download(self._session, link)
+            resp = _http_get_download(session, link, headers)
         except NetworkConnectionError as e:
             assert e.response is not None
+            if headers and e.response.status_code == 416:
+                # The journaled offset is not within the file on the server,
+                # e.g. the whole body was written before the interruption.
+                logger.info("Range request refused, restarting download of %s", link)
+                partial.offset, partial.validator = 0, None
+                continue
             logger.critical(
                 "HTTP error %s while getting %s", e.response.status_code, link
             )
             raise
 
-        filename = _get_http_response_filename(resp, link)
-        filepath = os.path.join(location, filename)
+        resumed = bool(headers) and resp.status_code == 206
+        if resumed and _get_content_range_start(resp) != partial.offset:
+            # Not the rest of the file: request all of it instead.
+            resp.close()
+            logger.info("Unexpected range in response, restarting download of %s", link)
+            partial.offset, partial.validator = 0, None
+            continue
+        offset = partial.offset if resumed else 0
+        if not resumed:
+            if headers:
+                logger.info("Range request refused, restarting download of %s", link)
+            hashers, hashed = _new_hashers(hashes), 0
+        elif hashed != offset:
+            # Resuming a file from an earlier run, hash what it holds.
+            hashers = _new_hashers(hashes)
+            with open(partial.path, "rb") as f:
+                remaining = offset
+                while remaining:
+                    block = f.read(min(remaining, CONTENT_CHUNK_SIZE))
+                    if not block:
+                        break
+                    for hasher in hashers.values():
+                        hasher.update(block)
+                    remaining -= len(block)
+            hashed = offset
+
+        filepath = os.path.join(location, _get_http_response_filename(resp, link))
+        validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+        length = _get_http_response_size(resp)
+        expected = None if length is None else offset + length
+        chunks = _prepare_download(resp, link, progress_bar)
+        written = journaled = offset
+        try:
+            with open(partial.path, "r+b" if resumed else "wb") as content_file:
+                content_file.seek(offset)
+                content_file.truncate()
+                for chunk in chunks:
+                    content_file.write(chunk)
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+                    written += len(chunk)
+                    hashed = written
+                    if on_chunk is not None:
+                        on_chunk(len(chunk))
+                    if resume_retries and written - journaled >= JOURNAL_INTERVAL:
+                        content_file.flush()
+                        partial.save(written, validator)
+                        journaled = written
+            if resume_retries and expected is not None and written < expected:
+                raise ProtocolError(f"got {written} bytes out of {expected}")
+        except _INTERRUPTED_ERRORS as exc:
+            if not resume_retries or validator is None:
+                partial.discard()
+                raise
+            partial.save(written, validator)
+            if attempts >= resume_retries:
+                raise
+            attempts += 1
+            logger.warning(
+                "Download of %s interrupted at %s (%s), resuming (attempt %d of %d)",
+                link,
+                format_size(written),
+                exc,
+                attempts,
+                resume_retries,
+            )
+            continue
+        except BaseException:
+            partial.discard()
+            raise
+        break
+
+    partial.complete(filepath)
+    digests = _check_digests(hashes, hashers, filepath)
+    content_type = resp.headers.get("Content-Type", "")
+    return DownloadedFile(filepath, content_type, digests)
+
+
+class Downloader:
+    def __init__(
+        self,
+        session: PipSession,
+        progress_bar: str,
+        resume_retries: int = 0,
+    ) -> None:
+        self._session = session
+        self._progress_bar = progress_bar
+        self._resume_retries = resume_retries
 
-        chunks = _prepare_download(resp, link, self._progress_bar)
-        with open(filepath, "wb") as content_file:
-            for chunk in chunks:
-                content_file.write(chunk)
-        content_type = resp.headers.get("Content-Type", "")
-        return filepath, content_type
+    def __call__(
+        self, link: Link, location: str, hashes: Optional[Hashes] = None
+    ) -> DownloadedFile:
+        """Download the file given by link into location.
+
+        If hashes is given, the file is checked against it while it is
+        written, and the digests are returned with the result.
+        """
+        return _download(
+            self._session,
+            link,
+            location,
+            self._progress_bar,
+            hashes,
+            resume_retries=self._resume_retries,
+        )
 
 
 class BatchDownloader:
+    """Download several links, optionally from a pool of worker threads.
+
+    With ``max_workers`` greater than one, links are streamed concurrently
+    through the shared session, so its adapters' connection pools are reused
+    across workers (requests' HTTPAdapter keeps up to 10 connections per
+    host by default). Results are yielded in completion order and a single
+    combined progress display replaces the per-file bars.
+    """
+
     def __init__(
         self,
         session: PipSession,
         progress_bar: str,
+        max_workers: int = 1,
+        resume_retries: int = 0,
     ) -> None:
         self._session = session
         self._progress_bar = progress_bar
+        self._max_workers = max_workers
+        self._resume_retries = resume_retries
 
     def __call__(
-        self, links: Iterable[Link], location: str
-    ) -> Iterable[Tuple[Link, Tuple[str, str]]]:
-        """Download the files given by links into location."""
-        for link in links:
-            try:
-                resp = _http_get_download(self._session, link)
-            except NetworkConnectionError as e:
-                assert e.response is not None
-                logger.critical(
-                    "HTTP error %s while getting %s",
-                    e.response.status_code,
+        self,
+        links: Iterable[Link],
+        location: str,
+        hashes: Optional[Mapping[Link, Hashes]] = None,
+    ) -> Iterable[Tuple[Link, DownloadedFile]]:
+        """Download the files given by links into location.
+
+        Files whose link is in hashes are checked while they are written,
+        see Downloader.
+        """
+        hashes = hashes or {}
+        if self._max_workers <= 1:
+            for link in links:
+                yield link, _download(
+                    self._session,
                     link,
+                    location,
+                    self._progress_bar,
+                    hashes.get(link),
+                    resume_retries=self._resume_retries,
                 )
-                raise
-
-            filename = _get_http_response_filename(resp, link)
-            filepath = os.path.join(location, filename)
-
-            chunks = _prepare_download(resp, link, self._progress_bar)
-            with open(filepath, "wb") as content_file:
-                for chunk in chunks:
-                    content_file.write(chunk)
-            content_type = resp.headers.get("Content-Type", "")
-            yield link, (filepath, content_type)
+            return
+
+        links = list(links)
+        if not links:
+            return
+        renderer = get_batch_download_progress_renderer(
+            bar_type=self._progress_bar, count=len(links)
+        )
+        with renderer as progress, ThreadPoolExecutor(
+            max_workers=min(self._max_workers, len(links)),
+            thread_name_prefix="pip-download",
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self._download_one, link, location, progress, hashes.get(link)
+                ): link
+                for link in links
+            }
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                # Don't start any more downloads if the consumer stopped
+                # early or one of the downloads failed.
+                for future in futures:
+                    future.cancel()
+
+    def _download_one(
+        self,
+        link: Link,
+        location: str,
+        progress: BatchDownloadProgress,
+        hashes: Optional[Hashes],
+    ) -> DownloadedFile:
+        # The combined display replaces per-file bars, so only log here.
+        downloaded = _download(
+            self._session,
+            link,
+            location,
+            "off",
+            hashes,
+            on_chunk=progress.advance,
+            resume_retries=self._resume_retries,
+        )
+        progress.file_done()
+        return downloaded
@@ -1,11 +1,17 @@
 """HTTP cache implementation.
 """
 
+import hashlib
+import json
 import os
+import sqlite3
+import threading
+import time
+import uuid
 from contextlib import contextmanager
-from typing import Iterator, Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
 
-from pip._vendor.cachecontrol.cache import BaseCache
+from pip._vendor.cachecontrol.cache import BaseCache, SeparateBodyBaseCache
 from pip._vendor.cachecontrol.caches import FileCache
 from pip._vendor.requests.models import Response
 
@@ -24,14 +30,17 @@ def suppressed_cache_errors() -> Iterator[None]:
     """
     try:
         yield
-    except OSError:
+    except (OSError, sqlite3.Error):
         pass
 
 
-class SafeFileCache(BaseCache):
+class SafeFileCache(SeparateBodyBaseCache):
     """
     A file based cache which is safe to use even when the target directory may
     not be accessible or writable.
+
+    Response bodies are stored in a ".body" file next to each entry and are
+    streamed to and from it.
     """
 
     def __init__(self, directory: str) -> None:
@@ -43,7 +52,9 @@ class SafeFileCache(BaseCache):
         # From cachecontrol.caches.file_cache.FileCache._fn, brought into our
         # class for backwards-compatibility and to avoid using a non-public
         # method.
-        hashed = FileCache.encode(name)
+        return self._get_hashed_path(FileCache.encode(name))
+
+    def _get_hashed_path(self, hashed: str) -> str:
         parts = list(hashed[:5]) + [hashed]
         return os.path.join(self.directory, *parts)
 
@@ -51,19 +62,558 @@ class SafeFileCache(BaseCache):
         path = self._get_cache_path(key)
         with suppressed_cache_errors():
             with open(path, "rb") as f:
-                return f.read()
+                value = f.read()
+            self.stats.record(True)
+            return value
+        self.stats.record(False)
+        return None
 
-    def set(self, key: str, value: bytes, expires: Optional[int] = None) -> None:
-        path = self._get_cache_path(key)
+    def _write(self, path: str, data: bytes) -> None:
         with suppressed_cache_errors():
             ensure_dir(os.path.dirname(path))
 
             with adjacent_tmp_file(path) as f:
-                f.write(value)
+                f.write(data)
 
             replace(f.name, path)
 
+    def set(self, key: str, value: bytes, expires: Optional[int] = None) -> None:
+        path = self._get_cache_path(key)
+        self._write(path, value)
+
     def delete(self, key: str) -> None:
         path = self._get_cache_path(key)
         with suppressed_cache_errors():
             os.remove(path)
+        with suppressed_cache_errors():
+            os.remove(path + ".body")
+
+    def get_body(self, key: str) -> Optional[BinaryIO]:
+        path = self._get_cache_path(key) + ".body"
+        with suppressed_cache_errors():
+            return open(path, "rb")
+        return None
+
+    def set_body(self, key: str, body: bytes) -> None:
+        # The body may be a memoryview of the downloaded data, which is
+        # written out without being copied.
+        path = self._get_cache_path(key) + ".body"
+        self._write(path, body)
+
+
+class BoundedFileCache(SafeFileCache):
+    """
+    A SafeFileCache bounded in total size and in the age of its entries.
+
+    Sizes and access times are tracked in an index file at the root of the
+    cache directory, so enforcing the bounds never walks the directory tree.
+    Entries are evicted least recently used first, or least frequently used
+    first with ``policy="lfu"``.  Processes sharing the cache merge their
+    changes into the index under a lock file, so none of them loses track of
+    the entries the others wrote.
+    """
+
+    index_name = "index.json"
+    lock_name = "index.json.lock"
+    # Evict down to this fraction of max_size, so that a full cache does
+    # not evict on every single write.
+    low_water_mark = 0.9
+    # Number of index updates after which the index is written out.
+    flush_interval = 64
+    # Temporary files older than this are leftovers of interrupted writes.
+    stale_tmp_age = 3600
+    # Seconds between removals of expired entries when writing.
+    expire_interval = 60
+    # Seconds to wait for the index lock, after which it is taken as stale.
+    lock_timeout = 10
+
+    def __init__(
+        self,
+        directory: str,
+        max_size: Optional[int] = None,
+        max_age: Optional[int] = None,
+        policy: str = "lru",
+    ) -> None:
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"unknown eviction policy: {policy!r}")
+        super().__init__(directory)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.policy = policy
+        self._lock = threading.RLock()
+        # hashed key -> [size, created, last access, hits]
+        self._entries: Dict[str, List[float]] = {}
+        self._total = 0
+        self._dirty = 0
+        self._expired_at = 0.0
+        self._compactor: Optional[threading.Thread] = None
+        self._load_index()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, self.index_name)
+
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_size(self) -> int:
+        return self._total
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            entries = index["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            # A missing or unreadable index is rebuilt from the tree once,
+            # which also adopts caches written by SafeFileCache.
+            self.compact()
+            return
+        with self._lock:
+            self._entries = entries
+            self._total = sum(int(entry[0]) for entry in entries.values())
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Hold the lock file of the index, shared with other processes.
+
+        A lock left behind by a process that died is broken after
+        lock_timeout seconds.
+        """
+        path = os.path.join(self.directory, self.lock_name)
+        deadline = time.time() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                if time.time() >= deadline:
+                    break
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            with suppressed_cache_errors():
+                os.remove(path)
+
+    def _merge_index(self) -> None:
+        """Merge in the changes other processes made to the index on disk.
+
+        Entries only one side knows of are kept if their file exists, so
+        entries added by others are adopted and entries removed by either
+        side are dropped.  For entries both sides know of, the latest write
+        and access win.
+        """
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                entries = json.load(f)["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            changed = set(entries).symmetric_difference(self._entries)
+        existing = {
+            name
+            for name in changed
+            if os.path.exists(self._get_hashed_path(name))
+        }
+        with self._lock:
+            for name, entry in entries.items():
+                known = self._entries.get(name)
+                if known is None:
+                    if name in existing:
+                        self._entries[name] = entry
+                        self._total += int(entry[0])
+                elif entry[1] > known[1]:
+                    # Written again by another process.
+                    self._entries[name] = entry
+                    self._total += int(entry[0]) - int(known[0])
+                else:
+                    known[2] = max(known[2], entry[2])
+                    known[3] = max(known[3], entry[3])
+            for name in changed - existing:
+                known = self._entries.pop(name, None)
+                if known is not None:
+                    self._total -= int(known[0])
+
+    def flush(self) -> None:
+        """Merge the index on disk, then write it out, replacing it
+        atomically.
+        """
+        with self._lock:
+            self._dirty = 0
+        with suppressed_cache_errors():
+            ensure_dir(self.directory)
+            with self._index_lock():
+                self._merge_index()
+                with self._lock:
+                    index = {
+                        "version": 1,
+                        "count": len(self._entries),
+                        "total": self._total,
+                        "entries": self._entries,
+                    }
+                    data = json.dumps(index, separators=(",", ":"))
+                with adjacent_tmp_file(self._index_path) as f:
+                    f.write(data.encode("utf-8"))
+                replace(f.name, self._index_path)
+
+    def _touch(self) -> None:
+        self._dirty += 1
+        if self._dirty >= self.flush_interval:
+            self.flush()
+
+    def _is_expired(self, entry: List[float], now: float) -> bool:
+        return self.max_age is not None and now - entry[1] > self.max_age
+
+    @staticmethod
+    def _split_body_name(name: str) -> Tuple[str, str]:
+        """Return the names of the entry and body files of an index name."""
+        if name.endswith(".body"):
+            name = name[: -len(".body")]
+        return name, name + ".body"
+
+    def _remove(self, name: str) -> None:
+        # An entry and its body are always removed together.
+        for victim in self._split_body_name(name):
+            entry = self._entries.pop(victim, None)
+            if entry is not None:
+                self._total -= int(entry[0])
+            with suppressed_cache_errors():
+                os.remove(self._get_hashed_path(victim))
+
+    def _rank(self, name: str) -> Tuple[float, float]:
+        # Bodies are ranked by the accesses of their entry.
+        entry = self._entries.get(self._split_body_name(name)[0], self._entries[name])
+        if self.policy == "lru":
+            return (entry[2], 0)
+        return (entry[3], entry[2])
+
+    def _evict(self, target: Optional[int]) -> None:
+        """Remove expired entries, then others until at most target bytes."""
+        now = time.time()
+        self._expired_at = now
+        victims = [
+            hashed
+            for hashed, entry in self._entries.items()
+            if self._is_expired(entry, now)
+        ]
+        for hashed in victims:
+            self._remove(hashed)
+        evicted = len(victims)
+        if target is not None and self._total > target:
+            for name in sorted(self._entries, key=self._rank):
+                if self._total <= target:
+                    break
+                if name in self._entries:
+                    self._remove(name)
+                    evicted += 1
+        if evicted:
+            self.stats.record_evictions(evicted)
+            self._touch()
+
+    def get(self, key: str) -> Optional[bytes]:
+        hashed = FileCache.encode(key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(hashed)
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(hashed)
+                self.stats.record_evictions()
+                self.stats.record(False)
+                self._touch()
+                return None
+        value = super().get(key)
+        with self._lock:
+            entry = self._entries.get(hashed)
+            if value is None:
+                if entry is not None:
+                    # Removed behind our back, e.g. by another process.
+                    self._entries.pop(hashed)
+                    self._total -= int(entry[0])
+                    self._touch()
+                return value
+            if entry is None:
+                # Written by another process since the index was loaded.
+                entry = self._entries[hashed] = [len(value), now, now, 0]
+                self._total += len(value)
+            for accessed in (entry, self._entries.get(hashed + ".body")):
+                if accessed is not None:
+                    accessed[2] = now
+                    accessed[3] += 1
+            self._touch()
+        return value
+
+    def set(self, key: str, value: bytes, expires: Optional[int] = None) -> None:
+        super().set(key, value, expires)
+        self._record_write(FileCache.encode(key), len(value))
+
+    def set_body(self, key: str, body: bytes) -> None:
+        super().set_body(key, body)
+        self._record_write(FileCache.encode(key) + ".body", len(body))
+
+    def _record_write(self, hashed: str, size: int) -> None:
+        now = time.time()
+        with self._lock:
+            old = self._entries.pop(hashed, None)
+            if old is not None:
+                self._total -= int(old[0])
+            self._entries[hashed] = [size, now, now, 0]
+            self._total += size
+            self._touch()
+            if self.max_size is not None and self._total > self.max_size:
+                self._evict(int(self.max_size * self.low_water_mark))
+            elif (
+                self.max_age is not None
+                and now - self._expired_at >= self.expire_interval
+            ):
+                # Expired entries would otherwise only go when read.
+                self._evict(None)
+
+    def delete(self, key: str) -> None:
+        hashed = FileCache.encode(key)
+        with self._lock:
+            self._remove(hashed)
+            self._touch()
+
+    def compact(self, background: bool = False) -> Optional[threading.Thread]:
+        """Reconcile the index with the cache directory and enforce bounds.
+
+        This is the only operation walking the tree: it adopts entries
+        written by other processes, forgets entries removed behind our back,
+        deletes leftover temporary files and empty directories, and evicts
+        what no longer fits.  With background=True it runs in a daemon
+        thread, which is returned.
+        """
+        if background:
+            with self._lock:
+                if self._compactor is None or not self._compactor.is_alive():
+                    self._compactor = threading.Thread(
+                        target=self.compact, name="pip-cache-compactor", daemon=True
+                    )
+                    self._compactor.start()
+                return self._compactor
+
+        now = time.time()
+        found: Dict[str, List[float]] = {}
+        with suppressed_cache_errors():
+            for root, dirs, files in os.walk(self.directory, topdown=False):
+                if root == self.directory:
+                    # Only the index lives at the top level.
+                    continue
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    with suppressed_cache_errors():
+                        st = os.stat(path)
+                        if filename.endswith(".tmp"):
+                            if now - st.st_mtime > self.stale_tmp_age:
+                                os.remove(path)
+                            continue
+                        found[filename] = [st.st_size, st.st_mtime, st.st_mtime, 0]
+                if not files:
+                    # Fails, harmlessly, unless the directory is empty.
+                    with suppressed_cache_errors():
+                        os.rmdir(root)
+
+        with self._lock:
+            for hashed, entry in found.items():
+                known = self._entries.get(hashed)
+                if known is not None and int(known[0]) == entry[0]:
+                    found[hashed] = known
+            self._entries = found
+            self._total = sum(int(entry[0]) for entry in found.values())
+            target = self.max_size
+            if target is not None and self._total > target:
+                target = int(target * self.low_water_mark)
+            self._evict(target)
+        self.flush()
+        return None
+
+    def close(self) -> None:
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        self.flush()
+
+
+class SQLiteCache(BaseCache):
+    """
+    A cache storing all entries in a single SQLite database.
+
+    This avoids the many small files of SafeFileCache, which are costly in
+    inodes and in lookups on network filesystems.  The database keeps the
+    default rollback journal, as WAL mode relies on shared memory, which
+    network filesystems don't provide, and every write is a transaction.
+    Bodies larger than inline_limit are kept in side files, written
+    completely before the row pointing at them is committed, so the database
+    stays small and a crash never exposes a partial body; side files left by
+    writes that never committed are removed by compact().  Like
+    SafeFileCache, errors accessing the cache are treated as misses.
+    """
+
+    db_name = "cache.sqlite3"
+    inline_limit = 64 * 1024
+    # Unreferenced side files older than this are leftovers of interrupted
+    # writes rather than writes about to be committed.
+    stale_side_file_age = 3600
+
+    def __init__(self, directory: str) -> None:
+        assert directory is not None, "Cache directory must not be None."
+        super().__init__()
+        self.directory = directory
+        self._lock = threading.Lock()
+        # Connections can't be shared between threads, keep one per thread.
+        self._connections: Dict[int, sqlite3.Connection] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        thread = threading.get_ident()
+        conn = self._connections.get(thread)
+        if conn is None:
+            ensure_dir(self.directory)
+            conn = sqlite3.connect(
+                os.path.join(self.directory, self.db_name),
+                timeout=30,
+                isolation_level=None,
+                # Each connection is only used by its thread, but close()
+                # closes them all from the calling thread.
+                check_same_thread=False,
+            )
+            # Also switches back databases created in WAL mode.
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB, path TEXT, expires REAL)"
+            )
+            with self._lock:
+                self._connections[thread] = conn
+        return conn
+
+    def _side_path(self, name: str) -> str:
+        return os.path.join(self.directory, "bodies", name[:2], name)
+
+    def _remove_side_file(self, name: Optional[str]) -> None:
+        if name is not None:
+            with suppressed_cache_errors():
+                os.remove(self._side_path(name))
+
+    def get(self, key: str) -> Optional[bytes]:
+        with suppressed_cache_errors():
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT value, path, expires FROM entries WHERE key = ?", (key,)
+                )
+                .fetchone()
+            )
+            if row is not None:
+                value, name, expires = row
+                if expires is not None and expires < time.time():
+                    self.delete(key)
+                elif name is None:
+                    self.stats.record(True)
+                    return value
+                else:
+                    with open(self._side_path(name), "rb") as f:
+                        value = f.read()
+                    self.stats.record(True)
+                    return value
+        self.stats.record(False)
+        return None
+
+    def set(self, key: str, value: bytes, expires: Optional[int] = None) -> None:
+        expires_at = None if expires is None else time.time() + expires
+        with suppressed_cache_errors():
+            name = None
+            if len(value) > self.inline_limit:
+                # A unique name per write: readers of the previous row keep
+                # a valid path until the new row is committed.
+                digest = hashlib.sha224(key.encode("utf-8")).hexdigest()
+                name = f"{digest}.{uuid.uuid4().hex}"
+                path = self._side_path(name)
+                ensure_dir(os.path.dirname(path))
+                with adjacent_tmp_file(path) as f:
+                    f.write(value)
+                replace(f.name, path)
+                value = None
+
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute(
+                        "SELECT path FROM entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, path, expires) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, value, name, expires_at),
+                    )
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            except BaseException:
+                self._remove_side_file(name)
+                raise
+            if row is not None:
+                self._remove_side_file(row[0])
+
+    def delete(self, key: str) -> None:
+        with suppressed_cache_errors():
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT path FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            if row is not None:
+                self._remove_side_file(row[0])
+
+    def compact(self) -> None:
+        """Remove expired entries and side files that no entry refers to."""
+        now = time.time()
+        with suppressed_cache_errors():
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = conn.execute(
+                    "SELECT path FROM entries WHERE expires < ?", (now,)
+                ).fetchall()
+                conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            for (name,) in expired:
+                self._remove_side_file(name)
+
+            referenced = {
+                name
+                for (name,) in conn.execute(
+                    "SELECT path FROM entries WHERE path IS NOT NULL"
+                )
+            }
+            for root, _, files in os.walk(os.path.join(self.directory, "bodies")):
+                for filename in files:
+                    if filename in referenced:
+                        continue
+                    path = os.path.join(root, filename)
+                    with suppressed_cache_errors():
+                        if now - os.stat(path).st_mtime > self.stale_side_file_age:
+                            os.remove(path)
+
+    def close(self) -> None:
+        """Sweep leftovers if the cache was used, and close all connections."""
+        if self._connections:
+            self.compact()
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
@@ -2,33 +2,61 @@
 
 __all__ = ["HTTPRangeRequestUnsupported", "dist_from_wheel_url"]
 
+import cgi
+import hashlib
+import json
+import os
+import struct
+import threading
 from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from tempfile import NamedTemporaryFile
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from zipfile import BadZipfile, ZipFile
 
 from pip._vendor.packaging.utils import canonicalize_name
 from pip._vendor.requests.models import CONTENT_CHUNK_SIZE, Response
 
 from pip._internal.metadata import BaseDistribution, MemoryWheel, get_wheel_distribution
+from pip._internal.network.cache import suppressed_cache_errors
 from pip._internal.network.session import PipSession
 from pip._internal.network.utils import HEADERS, raise_for_status, response_chunks
+from pip._internal.utils.filesystem import adjacent_tmp_file, replace
+from pip._internal.utils.misc import ensure_dir
+
+# End of central directory record, see APPNOTE.TXT 4.3.16. The record is
+# followed by a comment of at most 65535 bytes.
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_EOCD_STRUCT = "<4s4H2LH"
+_EOCD_SIZE = struct.calcsize(_EOCD_STRUCT)
+_EOCD_MAX_SIZE = _EOCD_SIZE + 0xFFFF
+
+# Zip64 end of central directory locator and record (APPNOTE.TXT 4.3.14-15).
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_LOCATOR_STRUCT = "<4sLQL"
+_ZIP64_LOCATOR_SIZE = struct.calcsize(_ZIP64_LOCATOR_STRUCT)
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_ZIP64_EOCD_STRUCT = "<4sQ2H2L4Q"
+_ZIP64_EOCD_SIZE = struct.calcsize(_ZIP64_EOCD_STRUCT)
 
 
 class HTTPRangeRequestUnsupported(Exception):
     pass
 
 
-def dist_from_wheel_url(name: str, url: str, session: PipSession) -> BaseDistribution:
+def dist_from_wheel_url(
+    name: str, url: str, session: PipSession, cache_dir: Optional[str] = None
+) -> BaseDistribution:
     """Return a distribution object from the given wheel URL.
 
     This uses HTTP range requests to only fetch the potion of the wheel
     containing metadata, just enough for the object to be constructed.
     If such requests are not supported, HTTPRangeRequestUnsupported
-    is raised.
+    is raised.  If cache_dir is given, fetched ranges are kept there
+    and reused for as long as the server reports the same strong ETag.
     """
-    with LazyZipOverHTTP(url, session) as zf:
+    with LazyZipOverHTTP(url, session, cache_dir=cache_dir) as zf:
         # For read-only ZIP files, ZipFile only needs methods read,
         # seek, seekable and tell, not the whole IO protocol.
         wheel = MemoryWheel(zf.name, zf)  # type: ignore
@@ -37,6 +65,112 @@ def dist_from_wheel_url(name: str, url: str, session: PipSession) -> BaseDistrib
         return get_wheel_distribution(wheel, canonicalize_name(name))
 
 
+def _parse_content_range(content_range: str) -> Tuple[int, int]:
+    """Return the inclusive interval of a "bytes start-end/length" value."""
+    unit, _, spec = content_range.strip().partition(" ")
+    interval = spec.split("/", 1)[0]
+    if unit != "bytes" or "-" not in interval:
+        raise HTTPRangeRequestUnsupported(f"invalid Content-Range: {content_range}")
+    start, end = interval.split("-", 1)
+    return int(start), int(end)
+
+
+def _iter_byteranges(response: Response) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, data) pairs of a multipart/byteranges response.
+
+    Servers may answer a multi-range request with a single part, e.g.
+    after merging the ranges themselves, which is handled as well.
+    """
+    content_type, params = cgi.parse_header(response.headers.get("Content-Type", ""))
+    if content_type != "multipart/byteranges":
+        start, _ = _parse_content_range(response.headers["Content-Range"])
+        yield start, response.content
+        return
+
+    delimiter = b"--" + params["boundary"].encode("ascii")
+    body = response.content
+    pos = body.find(delimiter)
+    while pos != -1 and not body.startswith(b"--", pos + len(delimiter)):
+        headers_end = body.index(b"\r\n\r\n", pos)
+        headers = body[pos + len(delimiter) : headers_end].decode("latin-1")
+        for line in headers.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-range":
+                start, end = _parse_content_range(value)
+                break
+        else:
+            raise HTTPRangeRequestUnsupported("byterange part without Content-Range")
+        # Slice by the announced length rather than searching for the
+        # next delimiter, which could also occur inside the data.
+        data_start = headers_end + 4
+        data_end = data_start + end - start + 1
+        yield start, body[data_start:data_end]
+        pos = body.find(delimiter, data_end)
+
+
+def _is_dist_info_member(filename: str) -> bool:
+    return filename.split("/", 1)[0].endswith(".dist-info")
+
+
+class _RangeCache:
+    """On-disk store of the byte ranges already fetched from a wheel.
+
+    Entries are keyed by URL and ETag, so a changed file on the server
+    never gets mixed with stale bytes.  The data lives in a sparse file
+    of the wheel's size, next to a JSON index of the stored intervals.
+    """
+
+    def __init__(self, directory: str, url: str, etag: str, length: int) -> None:
+        key = hashlib.sha224(f"{url}\0{etag}".encode("utf-8")).hexdigest()
+        self._path = os.path.join(directory, "lazy-wheels", key[:2], key)
+        self._index_path = self._path + ".json"
+        self._url, self._etag, self._length = url, etag, length
+
+    def load(self, file: Any) -> List[Tuple[int, int]]:
+        """Copy cached ranges into file and return their intervals."""
+        with suppressed_cache_errors():
+            with open(self._index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            if (index["url"], index["etag"], index["length"]) != (
+                self._url,
+                self._etag,
+                self._length,
+            ):
+                return []
+            intervals = [(start, end) for start, end in index["intervals"]]
+            with open(self._path, "rb") as f:
+                for start, end in intervals:
+                    f.seek(start)
+                    file.seek(start)
+                    file.write(f.read(end - start + 1))
+            return intervals
+        return []
+
+    def save(self, file: Any, intervals: Iterable[Tuple[int, int]]) -> None:
+        """Store the given intervals of file, replacing the entry atomically."""
+        intervals = list(intervals)
+        index = {
+            "url": self._url,
+            "etag": self._etag,
+            "length": self._length,
+            "intervals": intervals,
+        }
+        with suppressed_cache_errors():
+            ensure_dir(os.path.dirname(self._path))
+            with adjacent_tmp_file(self._path) as f:
+                f.truncate(self._length)
+                for start, end in intervals:
+                    file.seek(start)
+                    f.seek(start)
+                    f.write(file.read(end - start + 1))
+            replace(f.name, self._path)
+            # The index is written last: a crash in between leaves an
+            # index describing a subset of the new data file.
+            with adjacent_tmp_file(self._index_path) as f:
+                f.write(json.dumps(index).encode("utf-8"))
+            replace(f.name, self._index_path)
+
+
 class LazyZipOverHTTP:
     """File-like object mapped to a ZIP file over HTTP.
 
@@ -44,10 +178,20 @@ class LazyZipOverHTTP:
     which is supposed to be fed to ZipFile.  If such requests are not
     supported by the server, raise HTTPRangeRequestUnsupported
     during initialization.
+
+    Gaps closer than chunk_size are coalesced, several gaps are requested
+    at once with multi-range requests, and independent requests are made
+    from up to max_workers threads.  With a cache_dir, fetched ranges are
+    persisted and reused when the server reports the same strong ETag.
     """
 
     def __init__(
-        self, url: str, session: PipSession, chunk_size: int = CONTENT_CHUNK_SIZE
+        self,
+        url: str,
+        session: PipSession,
+        chunk_size: int = CONTENT_CHUNK_SIZE,
+        max_workers: int = 4,
+        cache_dir: Optional[str] = None,
     ) -> None:
         head = session.head(url, headers=HEADERS)
         raise_for_status(head)
@@ -55,12 +199,28 @@ class LazyZipOverHTTP:
          raise ValueError(f"Expected status code 200 but got {head.status_code} for URL: {url}")
         self._session, self._url, self._chunk_size = session, url, chunk_size   
         self._length = int(head.headers["Content-Length"])
+        # Weak validators cannot be used with If-Range (RFC 7233, 3.2): a
+        # server would ignore the Range and send the whole file.
+        etag = head.headers.get("ETag")
+        self._etag: Optional[str] = etag if etag and etag.startswith('"') else None
         self._file = NamedTemporaryFile()
         self.truncate(self._length)
         self._left: List[int] = []
         self._right: List[int] = []
         if "bytes" not in head.headers.get("Accept-Ranges", "none"):
             raise HTTPRangeRequestUnsupported("range request is not supported")
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._write_lock = threading.Lock()
+        self._multirange = True
+        self._cache: Optional[_RangeCache] = None
+        if cache_dir is not None and self._etag is not None:
+            self._cache = _RangeCache(cache_dir, url, self._etag, self._length)
+            with self._stay():
+                for start, end in self._cache.load(self._file):
+                    self._left.append(start)
+                    self._right.append(end)
+        self._cached_intervals = list(zip(self._left, self._right))
         self._check_zip()
 
     @property
@@ -79,6 +239,7 @@ class LazyZipOverHTTP:
 
     def close(self) -> None:
         """Close the file."""
+        self._release()
         self._file.close()
 
     @property
@@ -137,8 +298,23 @@ class LazyZipOverHTTP:
         return self
 
     def __exit__(self, *exc: Any) -> Optional[bool]:
+        # After an error, e.g. a failed fetch, nothing is persisted.
+        self._release(save=exc[0] is None)
         return self._file.__exit__(*exc)
 
+    def _release(self, save: bool = True) -> None:
+        """Stop the fetching threads and persist fetched ranges."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if not save or self._file.closed or self._cache is None:
+            return
+        intervals = list(zip(self._left, self._right))
+        if intervals != self._cached_intervals:
+            with self._stay():
+                self._cache.save(self._file, intervals)
+            self._cached_intervals = intervals
+
     @contextmanager
     def _stay(self) -> Iterator[None]:
         """Return a context manager keeping the position.
@@ -152,8 +328,25 @@ class LazyZipOverHTTP:
             self.seek(pos)
 
     def _check_zip(self) -> None:
-        """Check and download until the file is a valid ZIP."""
+        """Check and download until the file is a valid ZIP.
+
+        The central directory is located from the end of central directory
+        record and fetched in one request, together with the .dist-info
+        members.  Walking backwards chunk by chunk is kept as a fallback
+        for archives whose record cannot be parsed.
+        """
         end = self._length - 1
+        cd_start = self._locate_central_directory()
+        if cd_start is not None:
+            self._download(cd_start, end)
+            with self._stay():
+                try:
+                    zf = ZipFile(self)  # type: ignore
+                except BadZipfile:
+                    pass
+                else:
+                    self._prefetch_dist_info(zf, cd_start)
+                    return
         for start in reversed(range(0, end, self._chunk_size)):
             self._download(start, end)
             with self._stay():
@@ -166,14 +359,84 @@ class LazyZipOverHTTP:
                 else:
                     break
 
+    def _read_range(self, start: int, end: int) -> bytes:
+        """Return bytes from start to end inclusively, downloading them."""
+        self._download(start, end)
+        with self._stay():
+            self.seek(start)
+            return self._file.read(end - start + 1)
+
+    def _locate_central_directory(self) -> Optional[int]:
+        """Return the offset of the central directory, if it can be found.
+
+        The tail of the file is fetched speculatively: first one chunk,
+        which holds the record for archives without a long comment, then
+        the largest possible record if the signature was not found.
+        """
+        tail = min(self._length, max(self._chunk_size, _EOCD_SIZE))
+        data = self._read_range(self._length - tail, self._length - 1)
+        pos = data.rfind(_EOCD_SIGNATURE)
+        if pos < 0 and tail < min(self._length, _EOCD_MAX_SIZE):
+            tail = min(self._length, _EOCD_MAX_SIZE)
+            data = self._read_range(self._length - tail, self._length - 1)
+            pos = data.rfind(_EOCD_SIGNATURE)
+        if pos < 0 or len(data) - pos < _EOCD_SIZE:
+            return None
+
+        eocd_offset = self._length - len(data) + pos
+        record = struct.unpack(_EOCD_STRUCT, data[pos : pos + _EOCD_SIZE])
+        cd_size, cd_start = record[5], record[6]
+        if cd_start == 0xFFFFFFFF and eocd_offset >= _ZIP64_LOCATOR_SIZE:
+            locator = struct.unpack(
+                _ZIP64_LOCATOR_STRUCT,
+                self._read_range(eocd_offset - _ZIP64_LOCATOR_SIZE, eocd_offset - 1),
+            )
+            if locator[0] != _ZIP64_LOCATOR_SIGNATURE:
+                return None
+            zip64_offset = locator[2]
+            if zip64_offset + _ZIP64_EOCD_SIZE > eocd_offset:
+                return None
+            zip64_record = struct.unpack(
+                _ZIP64_EOCD_STRUCT,
+                self._read_range(zip64_offset, zip64_offset + _ZIP64_EOCD_SIZE - 1),
+            )
+            if zip64_record[0] != _ZIP64_EOCD_SIGNATURE:
+                return None
+            cd_size, cd_start = zip64_record[8], zip64_record[9]
+            eocd_offset = zip64_offset
+        if cd_start + cd_size > eocd_offset:
+            return None
+        return cd_start
+
+    def _prefetch_dist_info(self, zf: ZipFile, cd_start: int) -> None:
+        """Download all .dist-info members, which are read next, at once."""
+        infos = sorted(zf.infolist(), key=lambda info: info.header_offset)
+        stops = [info.header_offset for info in infos[1:]] + [cd_start]
+        self._download_ranges(
+            (info.header_offset, stop - 1)
+            for info, stop in zip(infos, stops)
+            if _is_dist_info_member(info.filename) and stop > info.header_offset
+        )
+
     def _stream_response(
         self, start: int, end: int, base_headers: Dict[str, str] = HEADERS
     ) -> Response:
         """Return HTTP response to a range request from start to end."""
+        return self._stream_ranges([(start, end)], base_headers)
+
+    def _stream_ranges(
+        self, ranges: List[Tuple[int, int]], base_headers: Dict[str, str] = HEADERS
+    ) -> Response:
+        """Return HTTP response to a request for the given ranges."""
         headers = base_headers.copy()
-        headers["Range"] = f"bytes={start}-{end}"
-        # TODO: Get range requests to be correctly cached
-        headers["Cache-Control"] = "no-cache"
+        headers["Range"] = "bytes=" + ",".join(
+            f"{start}-{end}" for start, end in ranges
+        )
+        if self._etag is not None:
+            # Get a full response rather than ranges of a changed file.
+            # The validator also lets the HTTP cache answer from stored
+            # segments of the same representation.
+            headers["If-Range"] = self._etag
         return self._session.get(self._url, headers=headers, stream=True)
 
     def _merge(
@@ -188,24 +451,122 @@ class LazyZipOverHTTP:
             right (int): Index after last overlapping downloaded data
         """
         lslice, rslice = self._left[left:right], self._right[left:right]
-        i = start = min([start] + lslice[:1])
-        end = max([end] + rslice[-1:])
+        i = start
         for j, k in zip(lslice, rslice):
             if j > i:
-                yield i, j - 1
-            i = k + 1
+                yield i, min(j - 1, end)
+            i = max(i, k + 1)
         if i <= end:
             yield i, end
+
+    def _missing(self, ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Return the parts of the given intervals not downloaded yet."""
+        gaps: List[Tuple[int, int]] = []
+        with self._write_lock:
+            for start, end in sorted(ranges):
+                left = bisect_left(self._right, start)
+                right = bisect_right(self._left, end)
+                gaps.extend(self._merge(start, end, left, right))
+        return gaps
+
+    def _mark(self, start: int, end: int) -> None:
+        """Record bytes from start to end inclusively as downloaded.
+
+        Intervals are only recorded once their bytes are written, so
+        that a failed fetch never leaves a gap marked as downloaded.
+        The caller holds the write lock.
+        """
+        left = bisect_left(self._right, start - 1)
+        right = bisect_right(self._left, end + 1)
+        if left < right:
+            start = min(start, self._left[left])
+            end = max(end, self._right[right - 1])
         self._left[left:right], self._right[left:right] = [start], [end]
 
+    def _coalesce(self, gaps: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Join gaps separated by less than a chunk of downloaded data.
+
+        Fetching the bytes in between again is cheaper than a round trip.
+        """
+        coalesced: List[Tuple[int, int]] = []
+        for start, end in sorted(gaps):
+            if coalesced and start - coalesced[-1][1] <= self._chunk_size:
+                coalesced[-1] = (coalesced[-1][0], max(end, coalesced[-1][1]))
+            else:
+                coalesced.append((start, end))
+        return coalesced
+
     def _download(self, start: int, end: int) -> None:
         """Download bytes from start to end inclusively."""
+        self._download_ranges([(start, end)])
+
+    def _download_ranges(self, ranges: Iterable[Tuple[int, int]]) -> None:
+        """Download all given inclusive intervals not downloaded yet."""
+        ranges = list(ranges)
         with self._stay():
-            left = bisect_left(self._right, start)
-            right = bisect_right(self._left, end)
-            for start, end in self._merge(start, end, left, right):
-                response = self._stream_response(start, end)
-                response.raise_for_status()
-                self.seek(start)
-                for chunk in response_chunks(response, self._chunk_size):
-                    self._file.write(chunk)
+            gaps = self._coalesce(self._missing(ranges))
+            if not gaps:
+                return
+            if len(gaps) == 1 or self._max_workers <= 1:
+                self._fetch(gaps)
+                self._check_downloaded(ranges)
+                return
+            # Split the gaps into contiguous batches, one per worker.
+            workers = min(self._max_workers, len(gaps))
+            size = -(-len(gaps) // workers)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="pip-lazy-wheel",
+                )
+            futures = [
+                self._executor.submit(self._fetch, gaps[i : i + size])
+                for i in range(0, len(gaps), size)
+            ]
+            for future in futures:
+                future.result()
+            self._check_downloaded(ranges)
+
+    def _check_downloaded(self, ranges: List[Tuple[int, int]]) -> None:
+        """Raise if the responses left some of the given intervals out."""
+        if self._missing(ranges):
+            raise HTTPRangeRequestUnsupported("incomplete range response")
+
+    def _fetch(self, gaps: List[Tuple[int, int]]) -> None:
+        """Fetch the given gaps, with one multi-range request if possible."""
+        if len(gaps) > 1 and self._multirange:
+            response = self._stream_ranges(gaps)
+            raise_for_status(response)
+            if response.status_code == 206:
+                for start, data in _iter_byteranges(response):
+                    self._write(start, [data])
+                # Request the gaps that the server left out one by one.
+                gaps = self._missing(gaps)
+            else:
+                # Multiple ranges are not supported: drop the full body
+                # and request the gaps one by one from now on.
+                response.close()
+                self._multirange = False
+        for start, end in gaps:
+            response = self._stream_response(start, end)
+            raise_for_status(response)
+            if response.status_code != 206:
+                response.close()
+                raise HTTPRangeRequestUnsupported("range request is not supported")
+            content_range = response.headers.get("Content-Range", "")
+            if _parse_content_range(content_range)[0] != start:
+                response.close()
+                raise HTTPRangeRequestUnsupported(
+                    f"unexpected Content-Range: {content_range}"
+                )
+            self._write(start, response_chunks(response, self._chunk_size))
+
+    def _write(self, start: int, chunks: Iterable[bytes]) -> None:
+        """Write chunks to the underlying file, starting at offset start."""
+        for chunk in chunks:
+            with self._write_lock:
+                self._file.seek(start)
+                self._file.write(chunk)
+                if chunk:
+                    self._mark(start, start + len(chunk) - 1)
+            start += len(chunk)
@@ -0,0 +1,71 @@
+"""Per-call cost of canonicalize_name and canonicalize_version.
+
+Times both functions over a mix of project names and versions as they
+appear in links, distributions and requirements: canonical and
+non-canonical spellings of a few hundred projects, called over and over
+as during a resolve.
+
+Run it with the packaging under test importable::
+
+    python benchmarks/bench_canonicalize.py [repeat]
+"""
+
+import random
+import sys
+import timeit
+
+from packaging.utils import canonicalize_name, canonicalize_version
+
+# fmt: off
+PROJECTS = [
+    "requests", "urllib3", "six", "setuptools", "pip", "wheel", "numpy",
+    "typing-extensions", "typing_extensions", "Django", "Flask", "Jinja2",
+    "MarkupSafe", "PyYAML", "python-dateutil", "zope.interface",
+    "ruamel.yaml", "backports.zoneinfo", "google-cloud-storage",
+    "Sphinx", "sphinx_rtd_theme", "importlib-metadata", "attrs", "idna",
+]
+
+VERSIONS = [
+    "1.0", "1.0.0", "2.28.1", "1.26.12", "1.16.0", "65.5.0", "22.3",
+    "0.38.4", "1.23.5", "4.4.0", "4.1.3", "2.2.2", "3.1.2", "2.1.1",
+    "6.0", "2.8.2", "1.0.0rc1", "1.0.post1", "2!1.0", "1.0.dev0+local",
+]
+# fmt: on
+
+
+def _names(count):
+    rng = random.Random(0)
+    names = []
+    for i in range(count):
+        name = rng.choice(PROJECTS)
+        if i % 3 == 0:
+            name = name.upper()
+        elif i % 3 == 1:
+            name = name.lower().replace("-", "_")
+        names.append(name + ("" if i % 4 else "-%d" % (i % 200)))
+    return names
+
+
+def _bench(function, arguments, repeat):
+    def run():
+        for argument in arguments:
+            function(argument)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(arguments) * 1e9
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    names = _names(10000)
+    versions = [VERSIONS[i % len(VERSIONS)] for i in range(10000)]
+    for function, arguments in [
+        (canonicalize_name, names),
+        (canonicalize_version, versions),
+    ]:
+        cost = _bench(function, arguments, repeat)
+        print("%-22s %8.0f ns/call" % (function.__name__, cost))
+
+
+if __name__ == "__main__":
+    main()
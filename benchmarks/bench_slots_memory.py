@@ -0,0 +1,63 @@
+"""Memory footprint of Tag, Version and Specifier objects.
+
+Creates ``count`` objects of each type from freshly formatted strings, as
+when reading a tag matrix or crawling an index, keeps them alive, and
+reports the memory traced by tracemalloc per object once the strings they
+were built from are gone.  The list holding the objects is allocated
+beforehand and not counted.  Memory held by the parse caches is counted,
+as it is what a process pays for the objects.
+
+Run it with the packaging under test importable::
+
+    python benchmarks/bench_slots_memory.py [count]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from packaging.specifiers import Specifier
+from packaging.tags import Tag
+from packaging.version import Version
+
+
+def _per_object(factory, count):
+    objects = [None] * count
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            objects[i] = factory(i)
+            hash(objects[i])
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) / count
+
+
+CASES = [
+    (
+        "Tag, 50 distinct",
+        lambda i: Tag(
+            "cp3%d" % (i % 10), "cp3%d" % (i % 10), "manylinux_2_%d_x86_64" % (i % 50)
+        ),
+    ),
+    ("Version, distinct", lambda i: Version("1.%d.%d" % (i // 100, i % 100))),
+    (
+        "Version, 1000 distinct",
+        lambda i: Version("1.%d.%d" % (i // 100 % 10, i % 100)),
+    ),
+    ("Specifier, 1000 distinct", lambda i: Specifier(">=1.%d" % (i % 1000))),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, factory in CASES:
+        print("%-28s %6.0f bytes/object" % (name, _per_object(factory, count)))
+
+
+if __name__ == "__main__":
+    main()
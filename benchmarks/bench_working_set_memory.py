@@ -0,0 +1,127 @@
+"""Memory footprint of a fully loaded 1,000-distribution WorkingSet.
+
+Writes a synthetic site-packages to a temporary directory: three in four
+distributions are .dist-info with Requires-Dist and Provides-Extra, the
+others .egg-info with requires.txt sections, extras and marker sections,
+most of them requiring the same popular projects.  Then it measures with
+tracemalloc the memory held by a WorkingSet of that directory once
+requires() was called on every distribution, for the null extra only or,
+with --all-extras, for all extras.  Each measure needs a fresh process, as
+pkg_resources caches parsed requirements.
+
+Run it with the pkg_resources under test importable::
+
+    python benchmarks/bench_working_set_memory.py [--all-extras]
+"""
+
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+import pkg_resources
+
+DISTRIBUTIONS = 1000
+
+COMMON = [
+    "six>=1.5",
+    "requests>=2.0,<3",
+    "urllib3",
+    "idna (>=2.5)",
+    "certifi",
+    "attrs>=19.2.0",
+    "typing-extensions; python_version < '3.8'",
+    "colorama; sys_platform == 'win32'",
+    "packaging>=20.0",
+    "click>=7.0",
+    "pyyaml",
+    "jinja2>=2.10",
+]
+
+EXTRAS = [
+    ("test", "pytest>=6"),
+    ("test", "coverage[toml]"),
+    ("docs", "sphinx"),
+    ("docs", "furo"),
+    ("lint", "mypy"),
+    ("lint", "black"),
+    ("security", "cryptography>=3.0"),
+]
+
+REQUIRES_TXT_EXTRAS = """
+[test]
+pytest
+six>=1.5
+
+[:python_version >= '3']
+modern
+
+[docs:sys_platform != 'nope']
+sphinx
+"""
+
+
+def make_site(root, count=DISTRIBUTIONS, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        name, version = "pkg%d" % i, "1.%d" % i
+        requires = rng.sample(COMMON, rng.randint(0, 6))
+        requires.append("pkg%d>=1.0" % rng.randrange(count))
+        if i % 4:
+            path = os.path.join(root, "%s-%s.dist-info" % (name, version))
+            os.mkdir(path)
+            extras = rng.sample(EXTRAS, rng.randint(0, 4))
+            lines = ["Metadata-Version: 2.1", "Name: " + name, "Version: " + version]
+            lines += ["Requires-Dist: " + req for req in requires]
+            lines += [
+                "Requires-Dist: %s; extra == '%s'" % (req, extra)
+                for extra, req in extras
+            ]
+            lines += ["Provides-Extra: " + extra for extra in sorted(dict(extras))]
+            with open(os.path.join(path, "METADATA"), "w") as f:
+                f.write("\n".join(lines) + "\n\n")
+        else:
+            path = os.path.join(root, "%s-%s.egg-info" % (name, version))
+            os.mkdir(path)
+            with open(os.path.join(path, "PKG-INFO"), "w") as f:
+                f.write("Metadata-Version: 1.0\n")
+                f.write("Name: %s\nVersion: %s\n" % (name, version))
+            requires = [req.split(";")[0] for req in requires]
+            with open(os.path.join(path, "requires.txt"), "w") as f:
+                f.write("\n".join(requires) + "\n" + REQUIRES_TXT_EXTRAS)
+
+
+def measure(site, all_extras):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        working_set = pkg_resources.WorkingSet([site])
+        for dist in working_set:
+            dist.requires(dist.extras if all_extras else ())
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return len(working_set.by_key), after - before
+
+
+def main():
+    all_extras = "--all-extras" in sys.argv[1:]
+    site = tempfile.mkdtemp()
+    try:
+        make_site(site)
+        count, size = measure(site, all_extras)
+        print(
+            "%d distributions, requires(%s): %.2f MiB"
+            % (count, "all extras" if all_extras else "", size / 2 ** 20)
+        )
+    finally:
+        shutil.rmtree(site)
+
+
+if __name__ == "__main__":
+    main()
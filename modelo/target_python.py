@@ -1,5 +1,6 @@
 import sys
-from typing import List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
 from pip._vendor.packaging.tags import Tag
 
@@ -22,6 +23,7 @@ class TargetPython:
         "py_version",
         "py_version_info",
         "_valid_tags",
+        "_tag_priorities",
     ]
 
     def __init__(
@@ -63,6 +65,8 @@ class TargetPython:
 
         # This is used to cache the return value of get_tags().
         self._valid_tags: Optional[List[Tag]] = None
+        # This is used to cache the return value of get_tag_priorities().
+        self._tag_priorities: Optional[Mapping[Tag, int]] = None
 
     def format_given(self) -> str:
         """
@@ -108,3 +112,19 @@ class TargetPython:
             self._valid_tags = tags
 
         return self._valid_tags
+
+    def get_tag_priorities(self) -> Mapping[Tag, int]:
+        """
+        Return a read-only mapping of the supported tags to their index in
+        get_tags(), lower being more preferred.
+
+        Wheel.support_index_min() and Wheel.supported() look wheel tags up in
+        it in constant time, instead of scanning the list of tags.
+        """
+        if self._tag_priorities is None:
+            priorities: Dict[Tag, int] = {}
+            for index, tag in enumerate(self.get_tags()):
+                priorities.setdefault(tag, index)
+            self._tag_priorities = MappingProxyType(priorities)
+
+        return self._tag_priorities
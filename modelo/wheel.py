@@ -2,7 +2,7 @@
 name that have meaning.
 """
 import re
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Mapping, Union
 
 from pip._vendor.packaging.tags import Tag
 
@@ -45,7 +45,7 @@ class Wheel:
         """Return the wheel's tags as a sorted list of strings."""
         return sorted(str(tag) for tag in self.file_tags)
 
-    def support_index_min(self, tags: List[Tag]) -> int:
+    def support_index_min(self, tags: Union[List[Tag], Mapping[Tag, int]]) -> int:
         """Return the lowest index that one of the wheel's file_tag combinations
         achieves in the given list of supported tags.
 
@@ -53,11 +53,15 @@ class Wheel:
         is first in the list, then return 0.
 
         :param tags: the PEP 425 tags to check the wheel against, in order
-            with most preferred first.
+            with most preferred first. Passing them as a mapping from tag to
+            index instead, like TargetPython.get_tag_priorities() returns,
+            avoids a linear scan of the list for each file tag.
 
         :raises ValueError: If none of the wheel's file tags match one of
             the supported tags.
         """
+        if isinstance(tags, Mapping):
+            return min(tags[tag] for tag in self.file_tags if tag in tags)
         return min(tags.index(tag) for tag in self.file_tags if tag in tags)
 
     def find_most_preferred_tag(
@@ -86,4 +90,7 @@ class Wheel:
 
         :param tags: the PEP 425 tags to check the wheel against.
         """
+        if isinstance(tags, Mapping):
+            # Look the few file tags up rather than iterating over all tags.
+            return any(tag in tags for tag in self.file_tags)
         return not self.file_tags.isdisjoint(tags)
@@ -4,6 +4,7 @@
 from __future__ import absolute_import, division, print_function
 
 import abc
+import bisect
 import functools
 import itertools
 import re
@@ -11,10 +12,11 @@ import re
 from ._compat import string_types, with_metaclass
 from ._typing import TYPE_CHECKING
 from .utils import canonicalize_version
-from .version import Version, LegacyVersion, parse
+from .version import _FINAL_RANK, Version, LegacyVersion, parse
 
 if TYPE_CHECKING:  # pragma: no cover
     from typing import (
+        Any,
         List,
         Dict,
         Union,
@@ -22,13 +24,21 @@ if TYPE_CHECKING:  # pragma: no cover
         Iterator,
         Optional,
         Callable,
+        Sequence,
         Tuple,
+        Type,
         FrozenSet,
     )
 
     ParsedVersion = Union[Version, LegacyVersion]
     UnparsedVersion = Union[Version, LegacyVersion, str]
     CallableOperator = Callable[[ParsedVersion, str], bool]
+    Bound = Tuple[Any, ...]
+    Interval = Tuple[Bound, Bound, bool]
+    SpecsInterval = Tuple[Bound, Bound, Tuple["Specifier", ...]]
+    CompiledSpecs = Tuple[
+        FrozenSet["_IndividualSpecifier"], Optional["_CompiledSpecifierSet"]
+    ]
 
 
 class InvalidSpecifier(ValueError):
@@ -38,6 +48,9 @@ class InvalidSpecifier(ValueError):
 
 
 class BaseSpecifier(with_metaclass(abc.ABCMeta, object)):  # type: ignore
+
+    __slots__ = ()
+
     @abc.abstractmethod
     def __str__(self):
         # type: () -> str
@@ -103,6 +116,8 @@ class BaseSpecifier(with_metaclass(abc.ABCMeta, object)):  # type: ignore
 
 class _IndividualSpecifier(BaseSpecifier):
 
+    __slots__ = ("_spec", "_prereleases", "_hash")
+
     _operators = {}  # type: Dict[str, str]
 
     def __init__(self, spec="", prereleases=None):
@@ -119,6 +134,9 @@ class _IndividualSpecifier(BaseSpecifier):
         # Store whether or not this Specifier should accept prereleases
         self._prereleases = prereleases
 
+        # Computed on first use, since canonicalizing the version is costly.
+        self._hash = None  # type: Optional[int]
+
     def __repr__(self):
         # type: () -> str
         pre = (
@@ -140,7 +158,14 @@ class _IndividualSpecifier(BaseSpecifier):
 
     def __hash__(self):
         # type: () -> int
-        return hash(self._canonical_spec)
+        if self._hash is None:
+            self._hash = hash(self._canonical_spec)
+        return self._hash
+
+    def __reduce__(self):
+        # type: () -> Tuple[Type[_IndividualSpecifier], Tuple[str, Optional[bool]]]
+        # String hashes are salted per process, so the hash can't be pickled.
+        return self.__class__, (str(self), self._prereleases)
 
     def __eq__(self, other):
         # type: (object) -> bool
@@ -262,6 +287,8 @@ class _IndividualSpecifier(BaseSpecifier):
 
 class LegacySpecifier(_IndividualSpecifier):
 
+    __slots__ = ()
+
     _regex_str = r"""
         (?P<operator>(==|!=|<=|>=|<|>))
         \s*
@@ -332,6 +359,8 @@ def _require_version_compare(
 
 class Specifier(_IndividualSpecifier):
 
+    __slots__ = ()
+
     _regex_str = r"""
         (?P<operator>(~=|==|!=|<=|>=|<|>|===))
         (?P<version>
@@ -447,24 +476,8 @@ class Specifier(_IndividualSpecifier):
         # implement this in terms of the other specifiers instead of
         # implementing it ourselves. The only thing we need to do is construct
         # the other specifiers.
-
-        # We want everything but the last item in the version, but we want to
-        # ignore post and dev releases and we want to treat the pre-release as
-        # it's own separate segment.
-        prefix = ".".join(
-            list(
-                itertools.takewhile(
-                    lambda x: (not x.startswith("post") and not x.startswith("dev")),
-                    _version_split(spec),
-                )
-            )[:-1]
-        )
-
-        # Add the prefix notation to the end of our string
-        prefix += ".*"
-
         return self._get_operator(">=")(prospective, spec) and self._get_operator("==")(
-            prospective, prefix
+            prospective, _compatible_prefix(spec)
         )
 
     @_require_version_compare
@@ -642,6 +655,27 @@ def _version_split(version):
     return result
 
 
+def _compatible_prefix(spec):
+    # type: (str) -> str
+    """
+    Return the ==prefix.* specifier version that ~=spec implies.
+    """
+    # We want everything but the last item in the version, but we want to
+    # ignore post and dev releases and we want to treat the pre-release as
+    # it's own separate segment.
+    prefix = ".".join(
+        list(
+            itertools.takewhile(
+                lambda x: (not x.startswith("post") and not x.startswith("dev")),
+                _version_split(spec),
+            )
+        )[:-1]
+    )
+
+    # Add the prefix notation to the end of our string
+    return prefix + ".*"
+
+
 def _pad_version(left, right):
     # type: (List[str], List[str]) -> Tuple[List[str], List[str]]
     left_split, right_split = [], []
@@ -661,6 +695,289 @@ def _pad_version(left, right):
     return (list(itertools.chain(*left_split)), list(itertools.chain(*right_split)))
 
 
+# Compiled specifier sets work on intervals of Version._key comparison keys
+# (see version._cmpkey). A bound is any tuple comparable with those keys:
+# _MIN_KEY sorts before every Version (LegacyVersion keys have an epoch of -1)
+# and _MAX_KEY after all of them, key + (0,) sorts right after key and before
+# anything greater, and _MAX_LOCAL sorts after any local segment.
+_MIN_KEY = (0,)  # type: Bound
+_MAX_KEY = (float("inf"),)  # type: Bound
+_MAX_LOCAL = ((2,),)  # type: Bound
+
+
+def _after(key):
+    # type: (Bound) -> Bound
+    return key + (0,)
+
+
+def _public_end(key):
+    # type: (Bound) -> Bound
+    """The bound after key and all of its local versions."""
+    return key[:8] + (_MAX_LOCAL,)
+
+
+def _base_start(key):
+    # type: (Bound) -> Bound
+    """The bound before every version with the same epoch and release."""
+    return key[:2]
+
+
+def _base_end(key):
+    # type: (Bound) -> Bound
+    """The bound after every version with the same epoch and release."""
+    return key[:2] + (_FINAL_RANK + 1,)
+
+
+_wildcard_prefix_regex = re.compile(
+    r"^(?:([1-9][0-9]*)!)?((?:0|[1-9][0-9]*)(?:\.(?:0|[1-9][0-9]*))*)$"
+)
+
+
+def _compile_prefix(prefix):
+    # type: (str) -> List[Interval]
+    """
+    Compile the prefix of an ==prefix.* specifier.
+
+    Prefix matching compares the dot separated segments of the version
+    strings, so it can be told from the comparison key alone only for a
+    normalized release prefix: a version with fewer release segments than the
+    prefix and a pre, post or dev segment (e.g. 1a1 for 1.0.*) doesn't match
+    while the same version spelled out (1.0a1) does, and with an epoch the
+    first segment may swallow a pre-release (1!1a1 for 1!1.*).
+    """
+    match = _wildcard_prefix_regex.search(prefix)
+    if not match:
+        return [(_MIN_KEY, _MAX_KEY, False)]
+
+    epoch = int(match.group(1) or 0)
+    release = tuple(int(i) for i in match.group(2).split("."))
+    stripped = release
+    while stripped and stripped[-1] == 0:
+        stripped = stripped[:-1]
+
+    # Zero padded, the releases starting with the prefix are contiguous.
+    start = (epoch, stripped)  # type: Bound
+    end = (epoch, release[:-1] + (release[-1] + 1,))  # type: Bound
+    if match.group(1):
+        return [(start, end, False)]
+    if len(release) > 1 and len(stripped) < len(release):
+        # Only versions of the release with its trailing zeros dropped can be
+        # spelled with fewer segments than the prefix.
+        return [(start, _base_end(start), False), (_base_end(start), end, True)]
+    return [(start, end, True)]
+
+
+def _complement(intervals):
+    # type: (List[Interval]) -> List[Interval]
+    complement = []  # type: List[Interval]
+    last = _MIN_KEY
+    for start, end, exact in intervals:
+        if last < start:
+            complement.append((last, start, True))
+        if not exact:
+            complement.append((start, end, False))
+        last = end
+    if last < _MAX_KEY:
+        complement.append((last, _MAX_KEY, True))
+    return complement
+
+
+def _intersect(left, right, merge):
+    # type: (List[Any], List[Any], Callable[[Any, Any], Any]) -> List[Any]
+    """
+    Intersect two sorted lists of (start, end, value) intervals, merging the
+    values of overlapping intervals.
+    """
+    intersection = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        start = max(left[i][0], right[j][0])
+        end = min(left[i][1], right[j][1])
+        if start < end:
+            intersection.append((start, end, merge(left[i][2], right[j][2])))
+        if left[i][1] < right[j][1]:
+            i += 1
+        else:
+            j += 1
+    return intersection
+
+
+def _compile_operator(operator, spec):
+    # type: (str, str) -> List[Interval]
+    """
+    Return the sorted intervals of comparison keys of the versions that
+    Specifier would match with operator and spec, each with a flag telling
+    whether all of the versions in it match or they still need to be checked.
+    """
+    if operator == "~=":
+        return _intersect(
+            _compile_operator(">=", spec),
+            _compile_operator("==", _compatible_prefix(spec)),
+            lambda left, right: left and right,
+        )
+
+    if operator in ("==", "!="):
+        if spec.endswith(".*"):
+            intervals = _compile_prefix(spec[:-2])
+        else:
+            spec_version = Version(spec)
+            key = spec_version._key
+            end = _after(key) if spec_version.local else _public_end(key)
+            intervals = [(key, end, True)]
+        return _complement(intervals) if operator == "!=" else intervals
+
+    spec_version = Version(spec)
+    key = spec_version._key
+    if operator == ">=":
+        return [(key, _MAX_KEY, True)]
+    if operator == "<=":
+        return [(_MIN_KEY, _public_end(key), True)]
+    if operator == "<":
+        if spec_version.is_prerelease:
+            return [(_MIN_KEY, key, True)]
+        # All the pre-releases of the release are excluded, which are all of
+        # the smaller versions with the same release unless spec is a
+        # post-release.
+        intervals = [(_MIN_KEY, _base_start(key), True)]
+        if spec_version.is_postrelease:
+            intervals.append((_base_start(key), key, False))
+        return intervals
+    if operator == ">":
+        # Local versions of the release are excluded, and so are its
+        # post-releases unless spec is one, which leaves nothing greater with
+        # the same release than a final release.
+        intervals = []
+        if spec_version.is_prerelease or spec_version.is_postrelease:
+            intervals.append((_after(key), _base_end(key), False))
+        intervals.append((_base_end(key), _MAX_KEY, True))
+        return intervals
+    raise ValueError("Cannot compile operator {0!r}".format(operator))
+
+
+def _can_compile(specs):
+    # type: (Iterable[_IndividualSpecifier]) -> bool
+    # LegacySpecifier and "===" don't compare versions by their keys.
+    return all(
+        isinstance(spec, Specifier) and spec.operator != "===" for spec in specs
+    )
+
+
+def _compile_specs(specs):
+    # type: (Iterable[Specifier]) -> List[SpecsInterval]
+    """
+    Intersect the intervals of specs, as sorted disjoint intervals listing the
+    specifiers that the versions in them still need to be checked against.
+    """
+    intervals = [(_MIN_KEY, _MAX_KEY, ())]  # type: List[SpecsInterval]
+    for spec in specs:
+        spec_intervals = [
+            (start, end, () if exact else (spec,))
+            for start, end, exact in _compile_operator(spec.operator, spec.version)
+        ]
+        intervals = _intersect(
+            intervals, spec_intervals, lambda left, right: left + right
+        )
+    return intervals
+
+
+def _normalize(intervals):
+    # type: (List[SpecsInterval]) -> List[Tuple[Bound, Bound, FrozenSet[Specifier]]]
+    """
+    Merge the adjacent intervals with the same checks, so that specifiers
+    compiled to the same versions compare equal whatever their splits.
+    """
+    normalized = []  # type: List[Tuple[Bound, Bound, FrozenSet[Specifier]]]
+    for start, end, specs in intervals:
+        checks = frozenset(specs)
+        if normalized and normalized[-1][1] == start and normalized[-1][2] == checks:
+            start = normalized.pop()[0]
+        normalized.append((start, end, checks))
+    return normalized
+
+
+def _covers(outer, inner):
+    # type: (List[SpecsInterval], List[SpecsInterval]) -> bool
+    """
+    Tell whether every version in the intervals of inner is certainly in
+    those of outer: a version in an interval of inner is checked against its
+    specifiers, so it only needs to be checked against a subset of them in
+    outer. A gap between intervals of outer is never considered covered.
+    """
+    i = 0
+    for start, end, specs in inner:
+        point = start
+        while point < end:
+            while i < len(outer) and not point < outer[i][1]:
+                i += 1
+            if i == len(outer):
+                return False
+            outer_start, outer_end, outer_specs = outer[i]
+            if point < outer_start or not set(outer_specs) <= set(specs):
+                return False
+            point = outer_end
+    return True
+
+
+class _CompiledSpecifierSet(object):
+    """
+    The versions matched by a set of specifiers, as a sorted list of disjoint
+    intervals of comparison keys.
+
+    The versions in an interval either all match, or still have to be checked
+    against the specifiers the interval lists, for the few operators whose
+    matches can't be fully described by intervals. Prereleases are left to
+    the caller.
+    """
+
+    def __init__(self, specs):
+        # type: (Iterable[Specifier]) -> None
+        intervals = _compile_specs(specs)
+        self._starts = [start for start, _, _ in intervals]
+        self._ends = [end for _, end, _ in intervals]
+        self._checks = [
+            tuple((spec._get_operator(spec.operator), spec.version) for spec in specs)
+            for _, _, specs in intervals
+        ]  # type: List[Tuple[Tuple[CallableOperator, str], ...]]
+
+    @classmethod
+    def compile(cls, specs):
+        # type: (FrozenSet[_IndividualSpecifier]) -> Optional[_CompiledSpecifierSet]
+        """Compile specs, or return None if they can't be compiled."""
+        if not specs or not _can_compile(specs):
+            return None
+        return cls(specs)  # type: ignore
+
+    def contains(self, item):
+        # type: (ParsedVersion) -> bool
+        if not isinstance(item, Version):
+            return False
+        key = item._key
+        index = bisect.bisect_right(self._starts, key) - 1
+        if index < 0 or not key < self._ends[index]:
+            return False
+        return all(check(item, spec) for check, spec in self._checks[index])
+
+    def filter_sorted(self, versions):
+        # type: (Sequence[ParsedVersion]) -> List[ParsedVersion]
+        keys = [version._key for version in versions]
+        filtered = []  # type: List[ParsedVersion]
+        lo = 0
+        for start, end, checks in zip(self._starts, self._ends, self._checks):
+            lo = bisect.bisect_left(keys, start, lo)
+            hi = bisect.bisect_left(keys, end, lo)
+            if not checks:
+                filtered.extend(versions[lo:hi])
+            else:
+                filtered.extend(
+                    version
+                    for version in versions[lo:hi]
+                    if isinstance(version, Version)
+                    and all(check(version, spec) for check, spec in checks)
+                )
+            lo = hi
+        return filtered
+
+
 class SpecifierSet(BaseSpecifier):
     def __init__(self, specifiers="", prereleases=None):
         # type: (str, Optional[bool]) -> None
@@ -685,6 +1002,9 @@ class SpecifierSet(BaseSpecifier):
         # we accept prereleases or not.
         self._prereleases = prereleases
 
+        # The compiled form of _specs, built when it is first needed.
+        self._compiled_specs = None  # type: Optional[CompiledSpecs]
+
     def __repr__(self):
         # type: () -> str
         pre = (
@@ -727,6 +1047,96 @@ class SpecifierSet(BaseSpecifier):
 
         return specifier
 
+    def intersection(self, *others):
+        # type: (*Union[SpecifierSet, str]) -> SpecifierSet
+        """
+        Returns the simplified intersection of this set with others, that is
+        (self & other & ...).simplify().
+
+        Unlike the & operator, which keeps every specifier of its operands,
+        the result has no redundant specifiers, so merging the constraints on a
+        project as they accumulate doesn't make checking candidates slower.
+        """
+        specifier = self
+        for other in others:
+            specifier = specifier & other
+        return specifier.simplify()
+
+    def simplify(self):
+        # type: () -> SpecifierSet
+        """
+        Returns an equivalent SpecifierSet without redundant specifiers, for
+        example ">=1.2,<2.5" for ">=1.0,>=1.2,<3,!=3.1,<2.5".
+
+        Specifiers are dropped one by one, as long as the versions matched
+        and whether pre-releases are, stay exactly the same. Sets with a
+        LegacySpecifier or an "===" specifier are returned as they are.
+        """
+        specifier = SpecifierSet()
+        specifier._specs = self._specs
+        specifier._prereleases = self._prereleases
+        if not _can_compile(self._specs):
+            return specifier
+
+        target = _normalize(_compile_specs(self._specs))
+        prereleases = self.prereleases
+        specs = set(self._specs)
+        for spec in sorted(self._specs, key=str):
+            remaining = specs - {spec}
+            # Without any specifier, filter() would change behavior.
+            if not remaining:
+                break
+            if self._prereleases is None and (
+                any(s.prereleases for s in remaining) != prereleases
+            ):
+                continue
+            if _normalize(_compile_specs(remaining)) == target:
+                specs = remaining
+
+        specifier._specs = frozenset(specs)
+        return specifier
+
+    def is_empty(self):
+        # type: () -> bool
+        """
+        Returns whether no version at all, pre-releases included, can satisfy
+        every specifier of this set, like ">=2,<1" or "==1.*,!=1.*".
+
+        A conflict is detected from the specifiers alone, so it can rule out a
+        project before looking for any candidates. This is only False when a
+        version can match, or when it can't be told: for sets with a
+        LegacySpecifier or an "===" specifier, and for some sets whose few
+        remaining versions need to be checked one by one.
+        """
+        if not _can_compile(self._specs):
+            return False
+        return not _compile_specs(self._specs)  # type: ignore
+
+    def issubset(self, other):
+        # type: (Union[SpecifierSet, str]) -> bool
+        """
+        Returns whether every version this set contains is also contained in
+        other, each set using its own prereleases setting.
+
+        This is only True when it is certain, which like is_empty() can't be
+        told for every set.
+        """
+        if isinstance(other, string_types):
+            other = SpecifierSet(other)
+        elif not isinstance(other, SpecifierSet):
+            raise TypeError("Cannot compare with {0!r}".format(other))
+
+        if not _can_compile(self._specs) or not _can_compile(other._specs):
+            return self._specs >= other._specs and self.prereleases == other.prereleases
+
+        inner = _compile_specs(self._specs)  # type: ignore
+        if not inner:
+            return True
+        # Pre-releases may be matched by self only.
+        if self.prereleases and not other.prereleases:
+            return False
+        return _covers(_compile_specs(other._specs), inner)  # type: ignore
+
     def __eq__(self, other):
         # type: (object) -> bool
         if isinstance(other, (string_types, _IndividualSpecifier)):
@@ -777,6 +1187,18 @@ class SpecifierSet(BaseSpecifier):
         # type: (bool) -> None
         self._prereleases = value
 
+    @property
+    def _compiled(self):
+        # type: () -> Optional[_CompiledSpecifierSet]
+        # _specs is replaced rather than mutated, e.g. by __and__, so the
+        # compiled form is valid as long as it was built from the same object.
+        if self._compiled_specs is None or self._compiled_specs[0] is not self._specs:
+            self._compiled_specs = (
+                self._specs,
+                _CompiledSpecifierSet.compile(self._specs),
+            )
+        return self._compiled_specs[1]
+
     def __contains__(self, item):
         # type: (Union[ParsedVersion, str]) -> bool
         return self.contains(item)
@@ -803,6 +1225,12 @@ class SpecifierSet(BaseSpecifier):
         if not prereleases and item.is_prerelease:
             return False
 
+        # Look the item up in the intervals of matching versions, if the
+        # specifiers could be compiled to them.
+        compiled = self._compiled
+        if compiled is not None:
+            return compiled.contains(item)
+
         # We simply dispatch to the underlying specs here to make sure that the
         # given version is contained within all of them.
         # Note: This use of all() here means that an empty set of specifiers
@@ -822,6 +1250,13 @@ class SpecifierSet(BaseSpecifier):
         if prereleases is None:
             prereleases = self.prereleases
 
+        # With compiled specifiers, a version matches the whole set at once. As
+        # prereleases is a bool from here on, no specifier would let
+        # pre-releases through when nothing else matches it either.
+        compiled = self._compiled
+        if compiled is not None:
+            return self._filter_compiled(compiled, iterable, bool(prereleases))
+
         # If we have any specifiers, then we want to wrap our iterable in the
         # filter method for each one, this will act as a logical AND amongst
         # each specifier.
@@ -861,3 +1296,71 @@ class SpecifierSet(BaseSpecifier):
                 return found_prereleases
 
             return filtered
+
+    def _filter_compiled(
+        self,
+        compiled,  # type: _CompiledSpecifierSet
+        iterable,  # type: Iterable[Union[ParsedVersion, str]]
+        prereleases,  # type: bool
+    ):
+        # type: (...) -> Iterator[Union[ParsedVersion, str]]
+        for item in iterable:
+            if not isinstance(item, (LegacyVersion, Version)):
+                parsed_version = parse(item)
+            else:
+                parsed_version = item
+
+            if (prereleases or not parsed_version.is_prerelease) and compiled.contains(
+                parsed_version
+            ):
+                yield item
+
+    def filter_sorted(
+        self,
+        versions,  # type: Sequence[ParsedVersion]
+        prereleases=None,  # type: Optional[bool]
+    ):
+        # type: (...) -> List[ParsedVersion]
+        """
+        Filter parsed versions sorted in ascending order, like filter().
+
+        The runs of matching versions are located by binary search and copied
+        as slices, rather than checking every version against every specifier.
+        """
+        compiled = self._compiled
+        if compiled is None:
+            return list(self.filter(versions, prereleases))
+
+        if prereleases is None:
+            prereleases = self.prereleases
+
+        filtered = compiled.filter_sorted(versions)
+        if not prereleases:
+            filtered = [version for version in filtered if not version.is_prerelease]
+        return filtered
+
+
+def best_match(
+    specifier_set,  # type: SpecifierSet
+    versions,  # type: Iterable[UnparsedVersion]
+    prereleases=None,  # type: Optional[bool]
+):
+    # type: (...) -> Optional[UnparsedVersion]
+    """
+    Return the newest of versions that specifier_set matches, or None if it
+    matches none of them.
+
+    This is the greatest item of specifier_set.filter(versions, prereleases),
+    the first one among equal versions, found in a single pass rather than by
+    sorting the matches.
+    """
+    best = None  # type: Optional[UnparsedVersion]
+    best_key = None  # type: Optional[Bound]
+    for item in specifier_set.filter(versions, prereleases):
+        if isinstance(item, (LegacyVersion, Version)):
+            key = item._key
+        else:
+            key = parse(item)._key
+        if best_key is None or key > best_key:
+            best, best_key = item, key
+    return best
@@ -13,6 +13,9 @@ except ImportError:  # pragma: no cover
 
     EXTENSION_SUFFIXES = [x[0] for x in imp.get_suffixes()]
     del imp
+import functools
+import hashlib
+import json
 import logging
 import os
 import platform
@@ -20,21 +23,26 @@ import re
 import struct
 import sys
 import sysconfig
+import tempfile
 import warnings
+from types import MappingProxyType
 
 from ._typing import TYPE_CHECKING, cast
 
 if TYPE_CHECKING:  # pragma: no cover
     from typing import (
+        Any,
         Dict,
         FrozenSet,
         IO,
         Iterable,
         Iterator,
         List,
+        Mapping,
         Optional,
         Sequence,
         Tuple,
+        Type,
         Union,
     )
 
@@ -65,13 +73,16 @@ class Tag(object):
     is also supported.
     """
 
-    __slots__ = ["_interpreter", "_abi", "_platform"]
+    __slots__ = ["_interpreter", "_abi", "_platform", "_hash"]
 
     def __init__(self, interpreter, abi, platform):
         # type: (str, str, str) -> None
-        self._interpreter = interpreter.lower()
-        self._abi = abi.lower()
-        self._platform = platform.lower()
+        # The same few strings are repeated across the thousands of tags of a
+        # platform matrix, so they are interned and the hash computed upfront.
+        self._interpreter = sys.intern(interpreter.lower())
+        self._abi = sys.intern(abi.lower())
+        self._platform = sys.intern(platform.lower())
+        self._hash = hash((self._interpreter, self._abi, self._platform))
 
     @property
     def interpreter(self):
@@ -94,14 +105,20 @@ class Tag(object):
             return NotImplemented
 
         return (
-            (self.platform == other.platform)
-            and (self.abi == other.abi)
-            and (self.interpreter == other.interpreter)
+            (self._hash == other._hash)  # Short-circuit ASAP for perf reasons.
+            and (self._platform == other._platform)
+            and (self._abi == other._abi)
+            and (self._interpreter == other._interpreter)
         )
 
     def __hash__(self):
         # type: () -> int
-        return hash((self._interpreter, self._abi, self._platform))
+        return self._hash
+
+    def __reduce__(self):
+        # type: () -> Tuple[Type[Tag], Tuple[str, str, str]]
+        # String hashes are salted per process, so the hash can't be pickled.
+        return self.__class__, (self._interpreter, self._abi, self._platform)
 
     def __str__(self):
         # type: () -> str
@@ -431,9 +448,11 @@ def _is_manylinux_compatible(name, glibc_version):
     return _have_compatible_glibc(*glibc_version)
 
 
+@functools.lru_cache(maxsize=None)
 def _glibc_version_string():
     # type: () -> Optional[str]
-    # Returns glibc version string, or None if not using glibc.
+    # Returns glibc version string, or None if not using glibc. It can't change
+    # within a process, so it is only probed once.
     return _glibc_version_string_confstr() or _glibc_version_string_ctypes()
 
 
@@ -592,6 +611,7 @@ class _ELFFileHeader(object):
         self.e_shstrndx = unpack(format_h)
 
 
+@functools.lru_cache(maxsize=None)
 def _get_elf_header():
     # type: () -> Optional[_ELFFileHeader]
     try:
@@ -738,7 +758,16 @@ def sys_tags(**kwargs):
     interpreter, from most to least important.
     """
     warn = _warn_keyword_parameter("sys_tags", kwargs)
+    if warn:
+        tags = _generate_sys_tags(warn)  # type: Iterable[Tag]
+    else:
+        tags = sys_tag_table()
+    for tag in tags:
+        yield tag
 
+
+def _generate_sys_tags(warn):
+    # type: (bool) -> Iterator[Tag]
     interp_name = interpreter_name()
     if interp_name == "cp":
         for tag in cpython_tags(warn=warn):
@@ -749,3 +778,136 @@ def sys_tags(**kwargs):
 
     for tag in compatible_tags():
         yield tag
+
+
+# Bumped whenever the tags of an interpreter cached on disk may change.
+_TAG_CACHE_VERSION = 2
+
+_sys_tag_table = None  # type: Optional[Tuple[Tag, ...]]
+_sys_tag_priorities = None  # type: Optional[Mapping[Tag, int]]
+
+
+def _manylinux_overrides():
+    # type: () -> Optional[Dict[str, bool]]
+    """
+    Returns the manylinux compatibility declared by the _manylinux module,
+    if there is one, see _is_manylinux_compatible().
+    """
+    try:
+        import _manylinux  # noqa
+    except ImportError:
+        return None
+    return {
+        name: bool(getattr(_manylinux, name))
+        for name in dir(_manylinux)
+        if name.endswith("_compatible")
+    }
+
+
+def _interpreter_fingerprint():
+    # type: () -> Optional[Dict[str, Any]]
+    """
+    Returns what the tags of the running interpreter depend on: the
+    interpreter itself, but also the glibc it runs with, a _manylinux module
+    and the platform, which may differ between hosts or containers sharing
+    an interpreter image and a cache directory.
+    """
+    try:
+        interpreter = os.path.realpath(sys.executable)
+        mtime = os.stat(interpreter).st_mtime
+    except (OSError, TypeError, ValueError):
+        return None
+    return {
+        "version": _TAG_CACHE_VERSION,
+        "interpreter": interpreter,
+        "mtime": mtime,
+        "python": sys.version,
+        "glibc": _glibc_version_string(),
+        "manylinux": _manylinux_overrides(),
+        "platform": [sysconfig.get_platform(), distutils.util.get_platform()],
+    }
+
+
+def _tag_cache_path(cache_dir, fingerprint):
+    # type: (str, Dict[str, Any]) -> str
+    interpreter = str(fingerprint["interpreter"])
+    digest = hashlib.sha256(interpreter.encode("utf-8", "surrogateescape"))
+    return os.path.join(cache_dir, "tags-{}.json".format(digest.hexdigest()[:32]))
+
+
+def _load_tag_cache(path, fingerprint):
+    # type: (str, Dict[str, Any]) -> Optional[List[Tag]]
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data["fingerprint"] != fingerprint:
+            return None
+        return [Tag(*triple) for triple in data["tags"]]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_tag_cache(path, fingerprint, tags):
+    # type: (str, Dict[str, Any], Sequence[Tag]) -> None
+    data = {
+        "fingerprint": fingerprint,
+        "tags": [[tag.interpreter, tag.abi, tag.platform] for tag in tags],
+    }
+    try:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, suffix=".tmp", delete=False
+        ) as f:
+            json.dump(data, f)
+        os.replace(f.name, path)
+    except (IOError, OSError) as e:
+        logger.debug("Could not cache the supported tags in %s: %s", path, e)
+
+
+def sys_tag_table(cache_dir=None):
+    # type: (Optional[str]) -> Tuple[Tag, ...]
+    """
+    Returns the tags of sys_tags() as a tuple, computed once per process.
+
+    If cache_dir is given, the tags are also cached on disk there, keyed by
+    the path and modification time of the interpreter, the glibc version and
+    the platform (see _interpreter_fingerprint()), so that other
+    processes running the same interpreter don't need to compute them again,
+    which involves probing glibc and reading the interpreter's ELF header.
+    """
+    global _sys_tag_table
+    if _sys_tag_table is not None:
+        return _sys_tag_table
+
+    fingerprint = _interpreter_fingerprint() if cache_dir else None
+    path = None
+    tags = None
+    if cache_dir and fingerprint is not None:
+        path = _tag_cache_path(cache_dir, fingerprint)
+        tags = _load_tag_cache(path, fingerprint)
+    if tags is None:
+        tags = list(_generate_sys_tags(warn=False))
+        if path is not None and fingerprint is not None:
+            _save_tag_cache(path, fingerprint, tags)
+
+    _sys_tag_table = tuple(tags)
+    return _sys_tag_table
+
+
+def sys_tag_priorities(cache_dir=None):
+    # type: (Optional[str]) -> Mapping[Tag, int]
+    """
+    Returns a read-only mapping of the tags of sys_tag_table() to their
+    priority, the index of their first occurrence, lower being more preferred.
+
+    This allows checking and ranking wheel tags in constant time.
+    """
+    global _sys_tag_priorities
+    if _sys_tag_priorities is None:
+        priorities = {}  # type: Dict[Tag, int]
+        for index, tag in enumerate(sys_tag_table(cache_dir)):
+            priorities.setdefault(tag, index)
+        _sys_tag_priorities = MappingProxyType(priorities)
+    return _sys_tag_priorities
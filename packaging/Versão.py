@@ -4,46 +4,49 @@
 from __future__ import absolute_import, division, print_function
 
 import collections
+import functools
 import itertools
 import re
 
-from ._structures import Infinity, NegativeInfinity
 from ._typing import TYPE_CHECKING
 
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import Callable, Iterator, List, Optional, SupportsInt, Tuple, Union
-
-    from ._structures import InfinityType, NegativeInfinityType
-
-    InfiniteTypes = Union[InfinityType, NegativeInfinityType]
-    PrePostDevType = Union[InfiniteTypes, Tuple[str, int]]
-    SubLocalType = Union[InfiniteTypes, int, str]
-    LocalType = Union[
-        NegativeInfinityType,
-        Tuple[
-            Union[
-                SubLocalType,
-                Tuple[SubLocalType, str],
-                Tuple[NegativeInfinityType, SubLocalType],
-            ],
-            ...,
-        ],
-    ]
-    CmpKey = Tuple[
-        int, Tuple[int, ...], PrePostDevType, PrePostDevType, PrePostDevType, LocalType
-    ]
+    from typing import (
+        Iterable,
+        Iterator,
+        List,
+        Optional,
+        SupportsInt,
+        Tuple,
+        Type,
+        Union,
+    )
+
+    SubLocalType = Union[int, str]
+    LocalType = Tuple[SubLocalType, ...]
+    LocalKey = Tuple[Tuple[int, SubLocalType], ...]
+    CmpKey = Tuple[int, Tuple[int, ...], int, int, int, int, int, int, LocalKey]
     LegacyCmpKey = Tuple[int, Tuple[str, ...]]
-    VersionComparisonMethod = Callable[
-        [Union[CmpKey, LegacyCmpKey], Union[CmpKey, LegacyCmpKey]], bool
-    ]
+    AnyCmpKey = Union[CmpKey, LegacyCmpKey]
 
-__all__ = ["parse", "Version", "LegacyVersion", "InvalidVersion", "VERSION_PATTERN"]
+__all__ = [
+    "parse",
+    "rank_versions",
+    "Version",
+    "LegacyVersion",
+    "InvalidVersion",
+    "VERSION_PATTERN",
+]
 
 
 _Version = collections.namedtuple(
     "_Version", ["epoch", "release", "dev", "pre", "post", "local"]
 )
 
+# How many distinct version strings have their parse remembered, the same
+# strings come up over and over again when sorting and filtering candidates.
+_VERSION_CACHE_SIZE = 4096
+
 
 def parse(version):
     # type: (str) -> Union[LegacyVersion, Version]
@@ -65,49 +68,76 @@ class InvalidVersion(ValueError):
 
 
 class _BaseVersion(object):
+    # Subclasses declare their own slots, including _key and _hash, so that
+    # the many versions created when crawling an index don't carry a __dict__.
+    __slots__ = ()
+
     _key = None  # type: Union[CmpKey, LegacyCmpKey]
+    _hash = None  # type: Optional[int]
 
     def __hash__(self):
         # type: () -> int
-        return hash(self._key)
+        if self._hash is None:
+            self._hash = hash(self._key)
+        return self._hash
+
+    def __reduce__(self):
+        # type: () -> Tuple[Type[_BaseVersion], Tuple[str]]
+        # String hashes are salted per process, so the hash can't be pickled.
+        return self.__class__, (str(self),)
 
     def __lt__(self, other):
         # type: (_BaseVersion) -> bool
-        return self._compare(other, lambda s, o: s < o)
+        if not isinstance(other, _BaseVersion):
+            return NotImplemented
+
+        return self._key < other._key
 
     def __le__(self, other):
         # type: (_BaseVersion) -> bool
-        return self._compare(other, lambda s, o: s <= o)
+        if not isinstance(other, _BaseVersion):
+            return NotImplemented
+
+        return self._key <= other._key
 
     def __eq__(self, other):
         # type: (object) -> bool
-        return self._compare(other, lambda s, o: s == o)
+        if not isinstance(other, _BaseVersion):
+            return NotImplemented
+
+        return self._key == other._key
 
     def __ge__(self, other):
         # type: (_BaseVersion) -> bool
-        return self._compare(other, lambda s, o: s >= o)
+        if not isinstance(other, _BaseVersion):
+            return NotImplemented
+
+        return self._key >= other._key
 
     def __gt__(self, other):
         # type: (_BaseVersion) -> bool
-        return self._compare(other, lambda s, o: s > o)
+        if not isinstance(other, _BaseVersion):
+            return NotImplemented
+
+        return self._key > other._key
 
     def __ne__(self, other):
         # type: (object) -> bool
-        return self._compare(other, lambda s, o: s != o)
-
-    def _compare(self, other, method):
-        # type: (object, VersionComparisonMethod) -> Union[bool, NotImplemented]
         if not isinstance(other, _BaseVersion):
             return NotImplemented
 
-        return method(self._key, other._key)
+        return self._key != other._key
 
 
 class LegacyVersion(_BaseVersion):
+
+    __slots__ = ("_version", "_key", "_hash")
+
     def __init__(self, version):
         # type: (str) -> None
         self._version = str(version)
         self._key = _legacy_cmpkey(self._version)
+        self._hash = None
 
     def __str__(self):
         # type: () -> str
@@ -264,20 +294,37 @@ VERSION_PATTERN = r"""
 """
 
 
-class Version(_BaseVersion):
+_version_regex = re.compile(
+    r"^\s*" + VERSION_PATTERN + r"\s*$", re.VERBOSE | re.IGNORECASE
+)
 
-    _regex = re.compile(r"^\s*" + VERSION_PATTERN + r"\s*$", re.VERBOSE | re.IGNORECASE)
+_release_regex = re.compile(r"[0-9]+(?:\.[0-9]+)*")
 
-    def __init__(self, version):
-        # type: (str) -> None
 
-        # Validate the version and parse it into pieces
-        match = self._regex.search(version)
+@functools.lru_cache(maxsize=_VERSION_CACHE_SIZE)
+def _parse_version(version):
+    # type: (str) -> Optional[Tuple[_Version, CmpKey]]
+    """
+    Parse a version string into its pieces and comparison key, or return None
+    if it isn't a valid PEP 440 version. Both are immutable, so the result is
+    shared by every Version made from the same string.
+    """
+    # Most versions are plain release segments, which don't need the regex.
+    if _release_regex.fullmatch(version):
+        parsed = _Version(
+            epoch=0,
+            release=tuple(int(i) for i in version.split(".")),
+            pre=None,
+            post=None,
+            dev=None,
+            local=None,
+        )
+    else:
+        match = _version_regex.search(version)
         if not match:
-            raise InvalidVersion("Invalid version: '{0}'".format(version))
+            return None
 
-        # Store the parsed out pieces of the version
-        self._version = _Version(
+        parsed = _Version(
             epoch=int(match.group("epoch")) if match.group("epoch") else 0,
             release=tuple(int(i) for i in match.group("release").split(".")),
             pre=_parse_letter_version(match.group("pre_l"), match.group("pre_n")),
@@ -288,15 +335,28 @@ class Version(_BaseVersion):
             local=_parse_local_version(match.group("local")),
         )
 
-        # Generate a key which will be used for sorting
-        self._key = _cmpkey(
-            self._version.epoch,
-            self._version.release,
-            self._version.pre,
-            self._version.post,
-            self._version.dev,
-            self._version.local,
-        )
+    key = _cmpkey(
+        parsed.epoch, parsed.release, parsed.pre, parsed.post, parsed.dev, parsed.local
+    )
+    return parsed, key
+
+
+class Version(_BaseVersion):
+
+    __slots__ = ("_version", "_key", "_hash")
+
+    _regex = _version_regex
+
+    def __init__(self, version):
+        # type: (str) -> None
+
+        # Validate the version and parse it into pieces, along with a key
+        # which will be used for sorting
+        parsed = _parse_version(version)
+        if parsed is None:
+            raise InvalidVersion("Invalid version: '{0}'".format(version))
+        self._version, self._key = parsed
+        self._hash = None
 
     def __repr__(self):
         # type: () -> str
@@ -471,15 +531,29 @@ def _parse_local_version(local):
     return None
 
 
+# The ranks of the pre-release phases in a comparison key. A version with
+# only a dev segment sorts before all pre-releases of the same release, and a
+# final release sorts after them.
+_DEV_ONLY_RANK = 0
+_PRE_RANKS = {"a": 1, "b": 2, "rc": 3}
+_FINAL_RANK = 4
+
+
 def _cmpkey(
     epoch,  # type: int
     release,  # type: Tuple[int, ...]
     pre,  # type: Optional[Tuple[str, int]]
     post,  # type: Optional[Tuple[str, int]]
     dev,  # type: Optional[Tuple[str, int]]
-    local,  # type: Optional[Tuple[SubLocalType]]
+    local,  # type: Optional[LocalType]
 ):
     # type: (...) -> CmpKey
+    """
+    Build a key which sorts versions as PEP 440 specifies.
+
+    The key is a flat tuple of ints, with the release and local segments as
+    nested tuples, so comparing two keys never calls back into Python code.
+    """
 
     # When we compare a release version, we want to compare it with all of the
     # trailing zeros removed. So we'll use a reverse the list, drop all the now
@@ -495,31 +569,30 @@ def _cmpkey(
     # if there is not a pre or a post segment. If we have one of those then
     # the normal sorting rules will handle this case correctly.
     if pre is None and post is None and dev is not None:
-        _pre = NegativeInfinity  # type: PrePostDevType
+        pre_rank, pre_number = _DEV_ONLY_RANK, 0
     # Versions without a pre-release (except as noted above) should sort after
     # those with one.
     elif pre is None:
-        _pre = Infinity
+        pre_rank, pre_number = _FINAL_RANK, 0
     else:
-        _pre = pre
+        pre_rank, pre_number = _PRE_RANKS[pre[0]], pre[1]
 
     # Versions without a post segment should sort before those with one.
     if post is None:
-        _post = NegativeInfinity  # type: PrePostDevType
-
+        has_post, post_number = 0, 0
     else:
-        _post = post
+        has_post, post_number = 1, post[1]
 
     # Versions without a development segment should sort after those with one.
     if dev is None:
-        _dev = Infinity  # type: PrePostDevType
-
+        no_dev, dev_number = 1, 0
     else:
-        _dev = dev
+        no_dev, dev_number = 0, dev[1]
 
     if local is None:
-        # Versions without a local segment should sort before those with one.
-        _local = NegativeInfinity  # type: LocalType
+        # Versions without a local segment should sort before those with one,
+        # which is what the empty tuple does.
+        _local = ()  # type: LocalKey
     else:
         # Versions with a local segment need that segment parsed to implement
         # the sorting rules in PEP440.
@@ -528,8 +601,42 @@ def _cmpkey(
         # - Numeric segments sort numerically
         # - Shorter versions sort before longer versions when the prefixes
         #   match exactly
-        _local = tuple(
-            (i, "") if isinstance(i, int) else (NegativeInfinity, i) for i in local
-        )
+        _local = tuple((1, i) if isinstance(i, int) else (0, i) for i in local)
+
+    return (
+        epoch,
+        _release,
+        pre_rank,
+        pre_number,
+        has_post,
+        post_number,
+        no_dev,
+        dev_number,
+        _local,
+    )
+
+
+def rank_versions(versions):
+    # type: (Iterable[Union[str, _BaseVersion]]) -> Tuple[List[AnyCmpKey], List[int]]
+    """
+    Compute the comparison keys of many versions at once, along with their
+    ranking: the indexes of versions in ascending order, equal versions
+    keeping their relative order.
+
+    Strings are parsed straight to their key, without creating Version or
+    LegacyVersion objects, and the ranking sorts the keys rather than the
+    versions. The keys of both kinds of version compare with each other like
+    the versions do, so they can also be used to compare versions later on.
+    """
+    keys = []  # type: List[AnyCmpKey]
+    for version in versions:
+        if isinstance(version, _BaseVersion):
+            keys.append(version._key)
+            continue
+        parsed = _parse_version(version)
+        if parsed is not None:
+            keys.append(parsed[1])
+        else:
+            keys.append(_legacy_cmpkey(str(version)))
 
-    return epoch, _release, _pre, _post, _dev, _local
+    return keys, sorted(range(len(keys)), key=keys.__getitem__)
@@ -3,15 +3,13 @@
 # for complete details.
 from __future__ import absolute_import, division, print_function
 
+import functools
 import operator
 import os
 import platform
+import re
 import sys
 
-from setuptools.extern.pyparsing import ParseException, ParseResults, stringStart, stringEnd
-from setuptools.extern.pyparsing import ZeroOrMore, Group, Forward, QuotedString
-from setuptools.extern.pyparsing import Literal as L  # noqa
-
 from ._compat import string_types
 from ._typing import TYPE_CHECKING
 from .specifiers import Specifier, InvalidSpecifier
@@ -19,7 +17,10 @@ from .specifiers import Specifier, InvalidSpecifier
 if TYPE_CHECKING:  # pragma: no cover
     from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+    MarkerAtom = Union[Tuple["Node", "Op", "Node"], List[Any]]
+
     Operator = Callable[[str, str], bool]
+    Evaluator = Callable[[Dict[str, str]], bool]
 
 
 __all__ = [
@@ -86,25 +87,25 @@ class Op(Node):
         return str(self)
 
 
-VARIABLE = (
-    L("implementation_version")
-    | L("platform_python_implementation")
-    | L("implementation_name")
-    | L("python_full_version")
-    | L("platform_release")
-    | L("platform_version")
-    | L("platform_machine")
-    | L("platform_system")
-    | L("python_version")
-    | L("sys_platform")
-    | L("os_name")
-    | L("os.name")  # PEP-345
-    | L("sys.platform")  # PEP-345
-    | L("platform.version")  # PEP-345
-    | L("platform.machine")  # PEP-345
-    | L("platform.python_implementation")  # PEP-345
-    | L("python_implementation")  # undocumented setuptools legacy
-    | L("extra")  # PEP-508
+VARIABLES = (
+    "implementation_version",
+    "platform_python_implementation",
+    "implementation_name",
+    "python_full_version",
+    "platform_release",
+    "platform_version",
+    "platform_machine",
+    "platform_system",
+    "python_version",
+    "sys_platform",
+    "os_name",
+    "os.name",  # PEP-345
+    "sys.platform",  # PEP-345
+    "platform.version",  # PEP-345
+    "platform.machine",  # PEP-345
+    "platform.python_implementation",  # PEP-345
+    "python_implementation",  # undocumented setuptools legacy
+    "extra",  # PEP-508
 )
 ALIASES = {
     "os.name": "os_name",
@@ -114,41 +115,96 @@ ALIASES = {
     "platform.python_implementation": "platform_python_implementation",
     "python_implementation": "platform_python_implementation",
 }
-VARIABLE.setParseAction(lambda s, l, t: Variable(ALIASES.get(t[0], t[0])))
-
-VERSION_CMP = (
-    L("===") | L("==") | L(">=") | L("<=") | L("!=") | L("~=") | L(">") | L("<")
-)
 
-MARKER_OP = VERSION_CMP | L("not in") | L("in")
-MARKER_OP.setParseAction(lambda s, l, t: Op(t[0]))
+# The tokens of the marker grammar. Alternatives are tried in order and, like
+# the literals of the grammar, don't need to end at a word boundary.
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_VARIABLE = re.compile("|".join(re.escape(name) for name in VARIABLES))
+_VALUE = re.compile(r"""'([^'\n\r]*)'|"([^"\n\r]*)\"""")
+_MARKER_OP = re.compile(r"===|==|>=|<=|!=|~=|>|<|not in|in")
+_BOOLOP = re.compile(r"and|or")
 
-MARKER_VALUE = QuotedString("'") | QuotedString('"')
-MARKER_VALUE.setParseAction(lambda s, l, t: Value(t[0]))
 
-BOOLOP = L("and") | L("or")
+class _ParseError(ValueError):
+    """
+    A marker or requirement could not be parsed, loc is the offending offset.
+    """
 
-MARKER_VAR = VARIABLE | MARKER_VALUE
+    def __init__(self, loc, msg):
+        # type: (int, str) -> None
+        super(_ParseError, self).__init__(msg)
+        self.loc = loc
+        self.msg = msg
 
-MARKER_ITEM = Group(MARKER_VAR + MARKER_OP + MARKER_VAR)
-MARKER_ITEM.setParseAction(lambda s, l, t: tuple(t[0]))
 
-LPAREN = L("(").suppress()
-RPAREN = L(")").suppress()
+def _skip_whitespace(source, loc):
+    # type: (str, int) -> int
+    return _WHITESPACE.match(source, loc).end()  # type: ignore
 
-MARKER_EXPR = Forward()
-MARKER_ATOM = MARKER_ITEM | Group(LPAREN + MARKER_EXPR + RPAREN)
-MARKER_EXPR << MARKER_ATOM + ZeroOrMore(BOOLOP + MARKER_EXPR)
 
-MARKER = stringStart + MARKER_EXPR + stringEnd
+def _parse_marker_var(source, loc):
+    # type: (str, int) -> Tuple[Node, int]
+    loc = _skip_whitespace(source, loc)
+    match = _VARIABLE.match(source, loc)
+    if match is not None:
+        name = match.group()
+        return Variable(ALIASES.get(name, name)), match.end()
+    match = _VALUE.match(source, loc)
+    if match is not None:
+        value = match.group(1)
+        return Value(match.group(2) if value is None else value), match.end()
+    raise _ParseError(loc, "Expected a marker variable or a quoted string")
 
 
-def _coerce_parse_result(results):
-    # type: (Union[ParseResults, List[Any]]) -> List[Any]
-    if isinstance(results, ParseResults):
-        return [_coerce_parse_result(i) for i in results]
-    else:
-        return results
+def _parse_marker_atom(source, loc):
+    # type: (str, int) -> Tuple[MarkerAtom, int]
+    try:
+        lhs, end = _parse_marker_var(source, loc)
+        end = _skip_whitespace(source, end)
+        match = _MARKER_OP.match(source, end)
+        if match is None:
+            raise _ParseError(end, "Expected a marker operator")
+        rhs, end = _parse_marker_var(source, match.end())
+        return (lhs, Op(match.group()), rhs), end
+    except _ParseError as item_error:
+        # Not a comparison, try a parenthesized expression. As with any
+        # alternatives, the error that got the furthest is reported.
+        try:
+            start = _skip_whitespace(source, loc)
+            if not source.startswith("(", start):
+                raise _ParseError(start, 'Expected "("')
+            markers, end = _parse_marker_expr(source, start + 1)
+            end = _skip_whitespace(source, end)
+            if not source.startswith(")", end):
+                raise _ParseError(end, 'Expected ")"')
+            return markers, end + 1
+        except _ParseError as group_error:
+            if group_error.loc > item_error.loc:
+                raise
+            raise item_error
+
+
+def _parse_marker_expr(source, loc):
+    # type: (str, int) -> Tuple[List[Any], int]
+    """Parse the longest marker expression starting at loc.
+
+    Returns the parsed markers and the offset just after them. As in the
+    PEP 508 grammar, a trailing boolean operator that isn't followed by a
+    valid expression is not consumed, so that the caller reports it.
+    """
+    atom, loc = _parse_marker_atom(source, loc)
+    markers = [atom]
+    while True:
+        start = _skip_whitespace(source, loc)
+        match = _BOOLOP.match(source, start)
+        if match is None:
+            return markers, loc
+        try:
+            atom, end = _parse_marker_atom(source, match.end())
+        except _ParseError:
+            return markers, loc
+        markers.extend((match.group(), atom))
+        loc = end
 
 
 def _format_marker(marker, first=True):
@@ -191,13 +247,19 @@ _operators = {
 }  # type: Dict[str, Operator]
 
 
-def _eval_op(lhs, op, rhs):
-    # type: (str, Op, str) -> bool
+@functools.lru_cache(maxsize=1024)
+def _get_specifier(spec):
+    # type: (str) -> Optional[Specifier]
     try:
-        spec = Specifier("".join([op.serialize(), rhs]))
+        return Specifier(spec)
     except InvalidSpecifier:
-        pass
-    else:
+        return None
+
+
+def _eval_op(lhs, op, rhs):
+    # type: (str, Op, str) -> bool
+    spec = _get_specifier("".join([op.serialize(), rhs]))
+    if spec is not None:
         return spec.contains(lhs)
 
     oper = _operators.get(op.serialize())  # type: Optional[Operator]
@@ -228,32 +290,73 @@ def _get_env(environment, name):
     return value
 
 
-def _evaluate_markers(markers, environment):
-    # type: (List[Any], Dict[str, str]) -> bool
-    groups = [[]]  # type: List[List[bool]]
+def _compile_marker_item(lhs, op, rhs):
+    # type: (Node, Op, Node) -> Evaluator
+    if isinstance(lhs, Variable):
+        name, value = lhs.value, rhs.value
+
+        def evaluate_item(environment):
+            # type: (Dict[str, str]) -> bool
+            return _eval_op(_get_env(environment, name), op, value)
+
+    else:
+        name, value = rhs.value, lhs.value
+
+        def evaluate_item(environment):
+            # type: (Dict[str, str]) -> bool
+            return _eval_op(value, op, _get_env(environment, name))
+
+    return evaluate_item
+
+
+def _compile_markers(markers):
+    # type: (List[Any]) -> Evaluator
+    """
+    Turn parsed markers into a function evaluating them in an environment.
+    """
+    groups = [[]]  # type: List[List[Evaluator]]
 
     for marker in markers:
         assert isinstance(marker, (list, tuple, string_types))
 
         if isinstance(marker, list):
-            groups[-1].append(_evaluate_markers(marker, environment))
+            groups[-1].append(_compile_markers(marker))
         elif isinstance(marker, tuple):
-            lhs, op, rhs = marker
-
-            if isinstance(lhs, Variable):
-                lhs_value = _get_env(environment, lhs.value)
-                rhs_value = rhs.value
-            else:
-                lhs_value = lhs.value
-                rhs_value = _get_env(environment, rhs.value)
-
-            groups[-1].append(_eval_op(lhs_value, op, rhs_value))
+            groups[-1].append(_compile_marker_item(*marker))
         else:
             assert marker in ["and", "or"]
             if marker == "or":
                 groups.append([])
 
-    return any(all(item) for item in groups)
+    frozen_groups = tuple(tuple(group) for group in groups)
+
+    def evaluate(environment):
+        # type: (Dict[str, str]) -> bool
+        # Every comparison is made, without short circuiting, so that an
+        # undefined name or comparison is reported whatever the others give.
+        results = [[item(environment) for item in group] for group in frozen_groups]
+        return any(all(group) for group in results)
+
+    return evaluate
+
+
+def _markers_key(markers):
+    # type: (List[Any]) -> Tuple[Any, ...]
+    """
+    Return a hashable key identifying parsed markers.
+
+    str() of a marker can't be used, as quoted values may contain the other
+    quote character.
+    """
+    key = []  # type: List[Any]
+    for marker in markers:
+        if isinstance(marker, list):
+            key.append(_markers_key(marker))
+        elif isinstance(marker, tuple):
+            key.append(tuple((type(node), node.value) for node in marker))
+        else:
+            key.append(marker)
+    return tuple(key)
 
 
 def format_full_version(info):
@@ -265,7 +368,7 @@ def format_full_version(info):
     return version
 
 
-def default_environment():
+def _compute_default_environment():
     # type: () -> Dict[str, str]
     if hasattr(sys, "implementation"):
         # Ignoring the `sys.implementation` reference for type checking due to
@@ -292,12 +395,43 @@ def default_environment():
     }
 
 
+_default_environment = None  # type: Optional[Dict[str, str]]
+
+
+def default_environment():
+    # type: () -> Dict[str, str]
+    """
+    Return the environment markers are evaluated in by default.
+
+    It is determined once per process; the returned dict is a copy which may
+    be changed freely.
+    """
+    global _default_environment
+    if _default_environment is None:
+        _default_environment = _compute_default_environment()
+    return dict(_default_environment)
+
+
+# Results of Marker.evaluate(), keyed by the markers and the environment
+# passed in. Once full, the cache is simply emptied.
+_EVALUATION_CACHE_SIZE = 4096
+_evaluation_cache = {}  # type: Dict[Tuple[Any, ...], bool]
+
+
 class Marker(object):
+
+    # Built when first needed, Requirement creates markers without __init__.
+    _key = None  # type: Optional[Tuple[Any, ...]]
+    _evaluator = None  # type: Optional[Evaluator]
+
     def __init__(self, marker):
         # type: (str) -> None
         try:
-            self._markers = _coerce_parse_result(MARKER.parseString(marker))
-        except ParseException as e:
+            self._markers, loc = _parse_marker_expr(marker, 0)
+            loc = _skip_whitespace(marker, loc)
+            if loc != len(marker):
+                raise _ParseError(loc, "Expected end of text")
+        except _ParseError as e:
             err_str = "Invalid marker: {0!r}, parse error at {1!r}".format(
                 marker, marker[e.loc : e.loc + 8]
             )
@@ -320,9 +454,34 @@ class Marker(object):
         part of the determined environment.
 
         The environment is determined from the current Python process.
+
+        Results are cached for each marker and environment argument, so
+        repeated evaluations are cheap.
         """
+        if self._key is None:
+            self._key = _markers_key(self._markers)
+        try:
+            cache_key = (
+                self._key,
+                tuple(sorted(environment.items())) if environment else (),
+            )  # type: Optional[Tuple[Any, ...]]
+            return _evaluation_cache[cache_key]  # type: ignore
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable or unorderable environment values, don't cache.
+            cache_key = None
+
         current_environment = default_environment()
         if environment is not None:
             current_environment.update(environment)
 
-        return _evaluate_markers(self._markers, current_environment)
+        if self._evaluator is None:
+            self._evaluator = _compile_markers(self._markers)
+        result = self._evaluator(current_environment)
+
+        if cache_key is not None:
+            if len(_evaluation_cache) >= _EVALUATION_CACHE_SIZE:
+                _evaluation_cache.clear()
+            _evaluation_cache[cache_key] = result
+        return result
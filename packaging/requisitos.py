@@ -3,20 +3,29 @@
 # for complete details.
 from __future__ import absolute_import, division, print_function
 
-import string
 import re
-
-from setuptools.extern.pyparsing import stringStart, stringEnd, originalTextFor, ParseException
-from setuptools.extern.pyparsing import ZeroOrMore, Word, Optional, Regex, Combine
-from setuptools.extern.pyparsing import Literal as L  # noqa
+from collections import namedtuple
 from urllib import parse as urlparse
 
 from ._typing import TYPE_CHECKING
-from .markers import MARKER_EXPR, Marker
+from .markers import Marker, _ParseError, _parse_marker_expr, _skip_whitespace
 from .specifiers import LegacySpecifier, Specifier, SpecifierSet
 
 if TYPE_CHECKING:  # pragma: no cover
-    from typing import List
+    from typing import (
+        Any,
+        Dict,
+        FrozenSet,
+        Iterable,
+        List,
+        Match,
+        Optional,
+        Tuple,
+    )
+
+    from .specifiers import _IndividualSpecifier
+
+    MarkerParse = Optional[Tuple[List[Any], int]]
 
 
 class InvalidRequirement(ValueError):
@@ -25,58 +34,177 @@ class InvalidRequirement(ValueError):
     """
 
 
-ALPHANUM = Word(string.ascii_letters + string.digits)
-
-LBRACKET = L("[").suppress()
-RBRACKET = L("]").suppress()
-LPAREN = L("(").suppress()
-RPAREN = L(")").suppress()
-COMMA = L(",").suppress()
-SEMICOLON = L(";").suppress()
-AT = L("@").suppress()
-
-PUNCTUATION = Word("-_.")
-IDENTIFIER_END = ALPHANUM | (ZeroOrMore(PUNCTUATION) + ALPHANUM)
-IDENTIFIER = Combine(ALPHANUM + ZeroOrMore(IDENTIFIER_END))
-
-NAME = IDENTIFIER("name")
-EXTRA = IDENTIFIER
-
-URI = Regex(r"[^ ]+")("url")
-URL = AT + URI
+IDENTIFIER = re.compile(r"[a-zA-Z0-9](?:[-_.a-zA-Z0-9]*[a-zA-Z0-9])?")
+URI = re.compile(r"[^ ]+")
 
-EXTRAS_LIST = EXTRA + ZeroOrMore(COMMA + EXTRA)
-EXTRAS = (LBRACKET + Optional(EXTRAS_LIST) + RBRACKET)("extras")
+VERSION_PEP440 = re.compile(Specifier._regex_str, re.VERBOSE | re.IGNORECASE)
+VERSION_LEGACY = re.compile(LegacySpecifier._regex_str, re.VERBOSE | re.IGNORECASE)
 
-VERSION_PEP440 = Regex(Specifier._regex_str, re.VERBOSE | re.IGNORECASE)
-VERSION_LEGACY = Regex(LegacySpecifier._regex_str, re.VERBOSE | re.IGNORECASE)
-
-VERSION_ONE = VERSION_PEP440 ^ VERSION_LEGACY
-VERSION_MANY = Combine(
-    VERSION_ONE + ZeroOrMore(COMMA + VERSION_ONE), joinString=",", adjacent=False
-)("_raw_spec")
-_VERSION_SPEC = Optional(((LPAREN + VERSION_MANY + RPAREN) | VERSION_MANY))
-_VERSION_SPEC.setParseAction(lambda s, l, t: t._raw_spec or "")
-
-VERSION_SPEC = originalTextFor(_VERSION_SPEC)("specifier")
-VERSION_SPEC.setParseAction(lambda s, l, t: t[1])
-
-MARKER_EXPR = originalTextFor(MARKER_EXPR())("marker")
-MARKER_EXPR.setParseAction(
-    lambda s, l, t: Marker(s[t._original_start : t._original_end])
+_ParsedRequirement = namedtuple(
+    "_ParsedRequirement", ["name", "extras", "url", "specifier", "marker"]
 )
-MARKER_SEPARATOR = SEMICOLON
-MARKER = MARKER_SEPARATOR + MARKER_EXPR
 
-VERSION_AND_MARKER = VERSION_SPEC + Optional(MARKER)
-URL_AND_MARKER = URL + Optional(MARKER)
 
-NAMED_REQUIREMENT = NAME + Optional(EXTRAS) + (URL_AND_MARKER | VERSION_AND_MARKER)
+def _parse_extras(source, loc):
+    # type: (str, int) -> Tuple[List[str], int]
+    """Parse "[extra, ...]" at loc, raising _ParseError if it isn't there."""
+    loc = _skip_whitespace(source, loc)
+    if not source.startswith("[", loc):
+        raise _ParseError(loc, 'Expected "["')
+    extras = []  # type: List[str]
+    loc = _skip_whitespace(source, loc + 1)
+    match = IDENTIFIER.match(source, loc)
+    if match is not None:
+        extras.append(match.group())
+        loc = match.end()
+        while True:
+            start = _skip_whitespace(source, loc)
+            if not source.startswith(",", start):
+                break
+            match = IDENTIFIER.match(source, _skip_whitespace(source, start + 1))
+            if match is None:
+                break
+            extras.append(match.group())
+            loc = match.end()
+    loc = _skip_whitespace(source, loc)
+    if not source.startswith("]", loc):
+        raise _ParseError(loc, 'Expected "]"')
+    return extras, loc + 1
+
+
+def _parse_version_one(source, loc):
+    # type: (str, int) -> Optional[Match[str]]
+    # The longest of the PEP 440 and legacy matches wins, PEP 440 on a tie.
+    loc = _skip_whitespace(source, loc)
+    pep440 = VERSION_PEP440.match(source, loc)
+    legacy = VERSION_LEGACY.match(source, loc)
+    if legacy is None or (pep440 is not None and pep440.end() >= legacy.end()):
+        return pep440
+    return legacy
+
+
+def _parse_version_many(source, loc):
+    # type: (str, int) -> Tuple[Optional[str], int]
+    """Parse comma separated specifiers at loc, returning them joined by ","."""
+    match = _parse_version_one(source, loc)
+    if match is None:
+        return None, loc
+    specifiers = [match.group()]
+    loc = match.end()
+    while True:
+        start = _skip_whitespace(source, loc)
+        if not source.startswith(",", start):
+            break
+        match = _parse_version_one(source, start + 1)
+        if match is None:
+            break
+        specifiers.append(match.group())
+        loc = match.end()
+    return ",".join(specifiers), loc
+
+
+def _parse_version_spec(source, loc):
+    # type: (str, int) -> Tuple[str, int]
+    """Parse an optional, possibly parenthesized, version specifier."""
+    start = _skip_whitespace(source, loc)
+    if source.startswith("(", start):
+        specifier, end = _parse_version_many(source, start + 1)
+        if specifier is not None:
+            end = _skip_whitespace(source, end)
+            if source.startswith(")", end):
+                return specifier, end + 1
+    specifier, end = _parse_version_many(source, loc)
+    return specifier or "", end
+
+
+def _parse_marker(source, loc, cache=None):
+    # type: (str, int, Optional[Dict[str, MarkerParse]]) -> Tuple[Optional[List[Any]], int]
+    """Parse an optional "; marker" at loc, returning the parsed markers.
+
+    A marker runs to the end of a valid requirement, so with a cache, the
+    parse is remembered for the rest of source and reused for other
+    requirements ending with the same text.
+    """
+    start = _skip_whitespace(source, loc)
+    if not source.startswith(";", start):
+        return None, loc
+    rest = source[start + 1 :]
+    if cache is not None and rest in cache:
+        parsed = cache[rest]
+    else:
+        try:
+            markers, end = _parse_marker_expr(rest, 0)
+            parsed = markers, end
+        except _ParseError:
+            parsed = None
+        if cache is not None:
+            cache[rest] = parsed
+    if parsed is None:
+        return None, loc
+    markers, end = parsed
+    return markers, start + 1 + end
+
+
+def _parse_requirement(source, marker_cache=None):
+    # type: (str, Optional[Dict[str, MarkerParse]]) -> _ParsedRequirement
+    """Parse a PEP 508 requirement in a single pass over source.
+
+    Like the grammar of PEP 508, the optional parts are parsed greedily and
+    given up on as a whole if they fail, so a syntax error is reported
+    where the longest valid prefix of source ends.
+    """
+    loc = _skip_whitespace(source, 0)
+    match = IDENTIFIER.match(source, loc)
+    if match is None:
+        raise _ParseError(loc, "Expected package name")
+    name = match.group()
+    loc = match.end()
+
+    try:
+        extras, loc = _parse_extras(source, loc)
+    except _ParseError:
+        extras = []
+
+    url = None
+    specifier = ""
+    start = _skip_whitespace(source, loc)
+    match = None
+    if source.startswith("@", start):
+        match = URI.match(source, _skip_whitespace(source, start + 1))
+    if match is not None:
+        url = match.group()
+        loc = match.end()
+    else:
+        specifier, loc = _parse_version_spec(source, loc)
+    marker, loc = _parse_marker(source, loc, marker_cache)
+
+    loc = _skip_whitespace(source, loc)
+    if loc != len(source):
+        raise _ParseError(loc, "Expected end of text")
+    return _ParsedRequirement(name, extras, url, specifier, marker)
+
+
+def _parse_and_validate(requirement_string, marker_cache=None):
+    # type: (str, Optional[Dict[str, MarkerParse]]) -> _ParsedRequirement
+    try:
+        req = _parse_requirement(requirement_string, marker_cache)
+    except _ParseError as e:
+        raise InvalidRequirement(
+            'Parse error at "{0!r}": {1}'.format(
+                requirement_string[e.loc : e.loc + 8], e.msg
+            )
+        )
 
-REQUIREMENT = stringStart + NAMED_REQUIREMENT + stringEnd
-# setuptools.extern.pyparsing isn't thread safe during initialization, so we do it eagerly, see
-# issue #104
-REQUIREMENT.parseString("x[]")
+    if req.url:
+        parsed_url = urlparse.urlparse(req.url)
+        if parsed_url.scheme == "file":
+            if urlparse.urlunparse(parsed_url) != req.url:
+                raise InvalidRequirement("Invalid URL given")
+        elif not (parsed_url.scheme and parsed_url.netloc) or (
+            not parsed_url.scheme and not parsed_url.netloc
+        ):
+            raise InvalidRequirement("Invalid URL: {0}".format(req.url))
+    return req
 
 
 class Requirement(object):
@@ -94,31 +222,61 @@ class Requirement(object):
 
     def __init__(self, requirement_string):
         # type: (str) -> None
-        try:
-            req = REQUIREMENT.parseString(requirement_string)
-        except ParseException as e:
-            raise InvalidRequirement(
-                'Parse error at "{0!r}": {1}'.format(
-                    requirement_string[e.loc : e.loc + 8], e.msg
-                )
-            )
+        self._set_parsed(_parse_and_validate(requirement_string))
 
+    def _set_parsed(self, req, specs=None):
+        # type: (_ParsedRequirement, Optional[FrozenSet[_IndividualSpecifier]]) -> None
         self.name = req.name
-        if req.url:
-            parsed_url = urlparse.urlparse(req.url)
-            if parsed_url.scheme == "file":
-                if urlparse.urlunparse(parsed_url) != req.url:
-                    raise InvalidRequirement("Invalid URL given")
-            elif not (parsed_url.scheme and parsed_url.netloc) or (
-                not parsed_url.scheme and not parsed_url.netloc
-            ):
-                raise InvalidRequirement("Invalid URL: {0}".format(req.url))
-            self.url = req.url
-        else:
-            self.url = None
-        self.extras = set(req.extras.asList() if req.extras else [])
-        self.specifier = SpecifierSet(req.specifier)
-        self.marker = req.marker if req.marker else None
+        self.url = req.url or None
+        self.extras = set(req.extras)
+
+        # The specifier and marker are only built when first accessed, as
+        # many callers only look at the name. specs are the already parsed
+        # specifiers of the specifier text, if the caller has them.
+        self._specifier = None  # type: Optional[SpecifierSet]
+        self._specifier_text = req.specifier
+        self._specifier_specs = specs
+        self._marker = None  # type: Optional[Marker]
+        self._marker_markers = req.marker  # type: Optional[List[Any]]
+
+        # The version of "===" is the only part of the specifier text that may
+        # contain a ",", which SpecifierSet splits on and can then reject, so
+        # it is built right away to raise InvalidSpecifier here as it used to.
+        if specs is None and "===" in self._specifier_text:
+            self._specifier = SpecifierSet(self._specifier_text)
+
+    @property
+    def specifier(self):
+        # type: () -> SpecifierSet
+        if self._specifier is None:
+            if self._specifier_specs is None:
+                self._specifier = SpecifierSet(self._specifier_text)
+            else:
+                self._specifier = SpecifierSet()
+                self._specifier._specs = self._specifier_specs
+        return self._specifier
+
+    @specifier.setter
+    def specifier(self, value):
+        # type: (SpecifierSet) -> None
+        self._specifier = value
+
+    @property
+    def marker(self):
+        # type: () -> Optional[Marker]
+        if self._marker_markers is not None:
+            # The expression was already parsed, don't parse it again in
+            # Marker().
+            self._marker = Marker.__new__(Marker)
+            self._marker._markers = self._marker_markers
+            self._marker_markers = None
+        return self._marker
+
+    @marker.setter
+    def marker(self, value):
+        # type: (Optional[Marker]) -> None
+        self._marker = value
+        self._marker_markers = None
 
     def __str__(self):
         # type: () -> str
@@ -143,3 +301,37 @@ class Requirement(object):
     def __repr__(self):
         # type: () -> str
         return "<Requirement({0!r})>".format(str(self))
+
+
+def parse_requirements_bulk(requirement_strings):
+    # type: (Iterable[str]) -> List[Requirement]
+    """
+    Parse many requirement strings at once, e.g. all the requirements of the
+    distributions installed in an environment.
+
+    Each distinct string is only parsed once, and the specifiers and markers
+    they have in common are shared between the requirements rather than
+    parsed again, which is what repeats the most across thousands of lines.
+    Raises InvalidRequirement for the first badly-formed requirement string.
+    """
+    parsed = {}  # type: Dict[str, _ParsedRequirement]
+    marker_cache = {}  # type: Dict[str, MarkerParse]
+    specs_cache = {}  # type: Dict[str, FrozenSet[_IndividualSpecifier]]
+
+    requirements = []  # type: List[Requirement]
+    for requirement_string in requirement_strings:
+        try:
+            req = parsed[requirement_string]
+        except KeyError:
+            req = parsed[requirement_string] = _parse_and_validate(
+                requirement_string, marker_cache
+            )
+        try:
+            specs = specs_cache[req.specifier]
+        except KeyError:
+            specs = specs_cache[req.specifier] = SpecifierSet(req.specifier)._specs
+
+        requirement = Requirement.__new__(Requirement)
+        requirement._set_parsed(req, specs)
+        requirements.append(requirement)
+    return requirements
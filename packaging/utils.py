@@ -3,6 +3,7 @@
 # for complete details.
 from __future__ import absolute_import, division, print_function
 
+import functools
 import re
 
 from ._typing import TYPE_CHECKING, cast
@@ -14,15 +15,36 @@ if TYPE_CHECKING:  # pragma: no cover
     NormalizedName = NewType("NormalizedName", str)
 
 _canonicalize_regex = re.compile(r"[-_.]+")
+_canonical_name_regex = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+# How many distinct names and versions have their canonical form remembered,
+# the same few hundred come up thousands of times during a resolve.
+_CANONICALIZE_CACHE_SIZE = 4096
 
 
 def canonicalize_name(name):
+    # type: (str) -> NormalizedName
+    # Most names are already canonical, which is cheaper to check than to
+    # look up, and leaves the cache to the others.
+    if (
+        name.islower()
+        and "_" not in name
+        and "." not in name
+        and _canonical_name_regex.fullmatch(name)
+    ):
+        return cast("NormalizedName", name)
+    return _canonicalize_name(name)
+
+
+@functools.lru_cache(maxsize=_CANONICALIZE_CACHE_SIZE)
+def _canonicalize_name(name):
     # type: (str) -> NormalizedName
     # This is taken from PEP 503.
     value = _canonicalize_regex.sub("-", name).lower()
     return cast("NormalizedName", value)
 
 
+@functools.lru_cache(maxsize=_CANONICALIZE_CACHE_SIZE)
 def canonicalize_version(_version):
     # type: (str) -> Union[Version, str]
     """
@@ -17,11 +17,15 @@ method.
 import sys
 import os
 import io
+import mmap
+import struct
 import time
 import re
 import types
+import copy
 import zipfile
 import zipimport
+import zlib
 import warnings
 import stat
 import functools
@@ -29,10 +33,13 @@ import pkgutil
 import operator
 import platform
 import collections
+import collections.abc
 import plistlib
 import email.parser
 import errno
 import tempfile
+import hashlib
+import json
 import textwrap
 import itertools
 import inspect
@@ -544,6 +551,8 @@ class WorkingSet:
         self.entry_keys = {}
         self.by_key = {}
         self.callbacks = []
+        # group -> (entry points, {name: entry points}), in working set order
+        self._ep_index = {}
 
         if entries is None:
             entries = sys.path
@@ -605,6 +614,7 @@ class WorkingSet:
         """
         self.entry_keys.setdefault(entry, [])
         self.entries.append(entry)
+        self._ep_index.clear()
         for dist in find_distributions(entry, True):
             self.add(dist, entry, False)
 
@@ -635,12 +645,33 @@ class WorkingSet:
         distributions in the working set, otherwise only ones matching
         both `group` and `name` are yielded (in distribution order).
         """
-        return (
-            entry
-            for dist in self
-            for entry in dist.get_entry_map(group).values()
-            if name is None or name == entry.name
-        )
+        return self._iter_entry_points(group, name)
+
+    def _iter_entry_points(self, group, name):
+        entries, by_name = self._entry_point_group(group)
+        for entry in entries if name is None else by_name.get(name, ()):
+            yield entry
+
+    def _entry_point_group(self, group):
+        """
+        Return the entry points of `group` in the working set, and by name.
+
+        They are indexed the first time `group` is looked up, until a
+        distribution or an entry is added.
+        """
+        try:
+            return self._ep_index[group]
+        except KeyError:
+            pass
+        entries = []
+        by_name = {}
+        for dist in self:
+            for entry in _get_entry_group(dist, group).values():
+                entries.append(entry)
+                by_name.setdefault(entry.name, []).append(entry)
+        self._ep_index[group] = entries, by_name
+        _scan_index.save()
+        return entries, by_name
 
     def run_script(self, requires, script_name):
         """Locate distribution for `requires` and run `script_name` script"""
@@ -725,12 +756,14 @@ class WorkingSet:
         """
 
         # set up the stack
-        requirements = list(requirements)[::-1]
+        requirements = collections.deque(list(requirements)[::-1])
         # set of processed requirements
         processed = {}
         # key -> dist
         best = {}
         to_activate = []
+        # (dist, extras) -> dist.requires(extras), reversed
+        requires = {}
 
         req_extras = _ReqExtras()
 
@@ -740,7 +773,7 @@ class WorkingSet:
 
         while requirements:
             # process dependencies breadth-first
-            req = requirements.pop(0)
+            req = requirements.popleft()
             if req in processed:
                 # Ignore cyclic or redundant dependencies
                 continue
@@ -776,8 +809,17 @@ class WorkingSet:
                 dependent_req = required_by[req]
                 raise VersionConflict(dist, req).with_context(dependent_req)
 
-            # push the new requirements onto the stack
-            new_requirements = dist.requires(req.extras)[::-1]
+            # push the new requirements onto the stack, except those already
+            # processed, which would be ignored anyway
+            new_requirements = requires.get((dist, req.extras))
+            if new_requirements is None:
+                new_requirements = requires[dist, req.extras] = (
+                    dist.requires(req.extras)[::-1])
+            new_requirements = [
+                new_requirement
+                for new_requirement in new_requirements
+                if new_requirement not in processed
+            ]
             requirements.extend(new_requirements)
 
             # Register the new requirements needed by req
@@ -905,6 +947,7 @@ class WorkingSet:
             callback(dist)
 
     def _added_new(self, dist):
+        self._ep_index.clear()
         for callback in self.callbacks:
             callback(dist)
 
@@ -920,6 +963,7 @@ class WorkingSet:
         self.entry_keys = keys.copy()
         self.by_key = by_key.copy()
         self.callbacks = callbacks[:]
+        self._ep_index = {}
 
 
 class _ReqExtras(dict):
@@ -927,6 +971,11 @@ class _ReqExtras(dict):
     Map each requirement to the extras that demanded it.
     """
 
+    def __init__(self, *args, **kwargs):
+        super(_ReqExtras, self).__init__(*args, **kwargs)
+        # (marker, extras) -> result of markers_pass()
+        self._passed = {}
+
     def markers_pass(self, req, extras=None):
         """
         Evaluate markers for req against each extra that
@@ -935,11 +984,19 @@ class _ReqExtras(dict):
         Return False if the req has a marker and fails
         evaluation. Otherwise, return True.
         """
-        extra_evals = (
-            req.marker.evaluate({'extra': extra})
-            for extra in self.get(req, ()) + (extras or (None,))
-        )
-        return not req.marker or any(extra_evals)
+        if not req.marker:
+            return True
+        all_extras = self.get(req, ()) + (extras or (None,))
+        # The requirements of a distribution are shared by all of the
+        # requirements it satisfies, and so are their markers.
+        key = req.marker, all_extras
+        passed = self._passed.get(key)
+        if passed is None:
+            passed = self._passed[key] = any(
+                req.marker.evaluate({'extra': extra})
+                for extra in all_extras
+            )
+        return passed
 
 
 class Environment:
@@ -1683,11 +1740,241 @@ class MemoizedZipManifests(ZipManifests):
         mtime = os.stat(path).st_mtime
 
         if path not in self or self[path].mtime != mtime:
+            replaced = self.get(path)
             manifest = self.build(path)
             self[path] = self.manifest_mod(manifest, mtime)
+            if replaced and isinstance(replaced.manifest, MappedZipManifest):
+                replaced.manifest.close()
 
         return self[path].manifest
 
+    @classmethod
+    def build(cls, path):
+        """
+        Build a manifest of the zipfile at path, memory-mapped from its
+        manifest file (see ``MappedZipManifest``) when one can be used.
+        """
+        manifest = MappedZipManifest.open(path)
+        if manifest is None:
+            manifest = super().build(path)
+        return manifest
+
+
+def _get_zip_manifest_dir():
+    """
+    Return the directory caching the manifests of zipped eggs, given by the
+    ``PKG_RESOURCES_ZIP_MANIFESTS`` environment variable, or None: the cache
+    is opt-in, so that reading resources never writes files by default.
+    """
+    return os.environ.get('PKG_RESOURCES_ZIP_MANIFESTS') or None
+
+
+class MappedZipManifest(collections.abc.Mapping):
+    """
+    A zip manifest read from a manifest file, which is memory-mapped so that
+    all the processes using an archive share one copy, and which gives a
+    ``ZipInfo`` for a name in constant time, without building one for each
+    member of the archive.
+
+    The manifest file of an archive is either next to it, with the suffix
+    ``.zipmanifest``, or in the cache directory named by
+    ``PKG_RESOURCES_ZIP_MANIFESTS``, where it is written when missing or out
+    of date.  It holds a header, a record for each member, a hash table of
+    the record numbers (open addressing, keyed by the CRC-32 of the name) and
+    the UTF-8 names the records point at.
+
+    The file stays mapped until ``close()``, which MemoizedZipManifests calls
+    when it replaces the manifest of an archive that changed.
+    """
+    suffix = '.zipmanifest'
+    magic = b'PKRZM\x00\x00\x01'
+
+    # magic, archive st_mtime_ns, archive st_size, records, hash table slots
+    _header = struct.Struct('<8sqqII')
+    # name hash, name offset, name length, CRC, file_size, compress_size,
+    # header_offset, compress_type, date_time
+    _record = struct.Struct('<IIIIQQQHH5Bx')
+    _slot = struct.Struct('<I')
+
+    def __init__(self, data, count, slots):
+        self._data = data
+        self._count = count
+        self._slots = slots
+        self._records = self._header.size
+        self._table = self._records + count * self._record.size
+
+    @classmethod
+    def open(cls, archive):
+        """
+        Map the manifest file of the zipfile at `archive`, writing one in the
+        cache directory if there is none for its current contents.  Return
+        None if no manifest file can be used.
+        """
+        archive_stat = os.stat(archive)
+        cache_path = cls._cache_path(archive)
+        for path in archive + cls.suffix, cache_path:
+            manifest = path and cls._load(path, archive_stat)
+            if manifest is not None:
+                return manifest
+        if not cache_path:
+            return None
+        try:
+            cls.write(archive, cache_path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # The manifest file is only an optimization.
+            return None
+        return cls._load(cache_path, archive_stat)
+
+    @staticmethod
+    def _cache_path(archive):
+        dirname = _get_zip_manifest_dir()
+        if not dirname:
+            return None
+        key = os.path.abspath(archive).encode('utf-8', 'surrogateescape')
+        return os.path.join(dirname, '%s-%s%s' % (
+            os.path.basename(archive),
+            hashlib.sha256(key).hexdigest()[:16],
+            MappedZipManifest.suffix,
+        ))
+
+    @classmethod
+    def _load(cls, path, archive_stat):
+        try:
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(data) >= cls._header.size:
+            magic, mtime, size, count, slots = cls._header.unpack_from(data)
+            end = (
+                cls._header.size + count * cls._record.size
+                + slots * cls._slot.size
+            )
+            if (
+                magic == cls.magic
+                and mtime == archive_stat.st_mtime_ns
+                and size == archive_stat.st_size
+                and slots and not slots & (slots - 1)
+                and len(data) >= end
+            ):
+                return cls(data, count, slots)
+        data.close()
+        return None
+
+    @classmethod
+    def write(cls, archive, path):
+        """Write the manifest file of the zipfile at `archive` to `path`"""
+        archive_stat = os.stat(archive)
+        with zipfile.ZipFile(archive) as zfile:
+            # The last of several members with the same name wins, as with
+            # ZipFile.getinfo.
+            members = {info.filename: info for info in zfile.infolist()}
+        count = len(members)
+        slots = 1
+        while slots < 2 * count:
+            slots *= 2
+        table = [0] * slots
+        records = []
+        names = []
+        offset = (
+            cls._header.size + count * cls._record.size
+            + slots * cls._slot.size
+        )
+        for number, info in enumerate(members.values()):
+            name = info.filename.encode('utf-8')
+            name_hash = zlib.crc32(name)
+            slot = name_hash & (slots - 1)
+            while table[slot]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = number + 1
+            records.append(cls._record.pack(
+                name_hash, offset, len(name), info.CRC, info.file_size,
+                info.compress_size, info.header_offset, info.compress_type,
+                *info.date_time
+            ))
+            names.append(name)
+            offset += len(name)
+        data = b''.join([
+            cls._header.pack(
+                cls.magic, archive_stat.st_mtime_ns, archive_stat.st_size,
+                count, slots),
+            b''.join(records),
+            b''.join(map(cls._slot.pack, table)),
+            b''.join(names),
+        ])
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'wb', dir=dirname, suffix='.tmp', delete=False) as f:
+            f.write(data)
+        try:
+            os.replace(f.name, path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+    def close(self):
+        """Release the map of the manifest file"""
+        self._data.close()
+
+    def _find(self, key):
+        """Return the offset of the record of `key`, or None"""
+        if not isinstance(key, str):
+            return None
+        if os.sep != '/':
+            key = key.replace(os.sep, '/')
+        try:
+            name = key.encode('utf-8')
+        except UnicodeEncodeError:
+            return None
+        data = self._data
+        name_hash = zlib.crc32(name)
+        mask = self._slots - 1
+        slot = name_hash & mask
+        while True:
+            number, = self._slot.unpack_from(
+                data, self._table + slot * self._slot.size)
+            if not number:
+                return None
+            record = self._records + (number - 1) * self._record.size
+            record_hash, offset, length = struct.unpack_from(
+                '<III', data, record)
+            if record_hash == name_hash and (
+                    data[offset:offset + length] == name):
+                return record
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, key):
+        record = self._find(key)
+        if record is None:
+            raise KeyError(key)
+        (
+            _, offset, length, crc, file_size, compress_size, header_offset,
+            compress_type, *date_time
+        ) = self._record.unpack_from(self._data, record)
+        name = self._data[offset:offset + length].decode('utf-8')
+        info = zipfile.ZipInfo(name, tuple(date_time))
+        info.CRC = crc
+        info.file_size = file_size
+        info.compress_size = compress_size
+        info.header_offset = header_offset
+        info.compress_type = compress_type
+        return info
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        data = self._data
+        for number in range(self._count):
+            record = self._records + number * self._record.size
+            _, offset, length = struct.unpack_from('<III', data, record)
+            yield data[offset:offset + length].decode('utf-8').replace(
+                '/', os.sep)
+
+    def __len__(self):
+        return self._count
+
 
 class ZipProvider(EggProvider):
     """Resource support for zips and eggs"""
@@ -2041,27 +2328,223 @@ def find_on_path(importer, path_item, only=False):
         )
         return
 
+    # scan for .egg and .egg-info in directory
+    for entry, kind in _scan_index.entries(path_item):
+        if only and kind in ('egg', 'egg-link'):
+            continue
+        fullpath = os.path.join(path_item, entry)
+        for dist in _dists_from_entry(path_item, fullpath, kind):
+            yield dist
+
+
+def _scan_path_item(path_item):
+    """
+    List the entries of directory `path_item` that may yield distributions,
+    in descending order by version, as (name, kind) pairs.
+
+    The kind of an entry only depends on its name and on whether it is a
+    directory, so it stays valid as long as `path_item` isn't modified.
+    What lies inside an entry is checked when distributions are made from
+    it.
+    """
     entries = (
         os.path.join(path_item, child)
         for child in safe_listdir(path_item)
     )
+    kinds = {}
+    for entry in entries:
+        lower = entry.lower()
+        if lower.endswith('.egg-info') or lower.endswith('.dist-info'):
+            if os.path.isdir(entry):
+                kinds[entry] = 'dir'
+            elif lower.endswith('.egg-info'):
+                kinds[entry] = 'file'
+        elif lower.endswith('.egg'):
+            kinds[entry] = 'egg'
+        elif lower.endswith('.egg-link'):
+            kinds[entry] = 'egg-link'
+    return [
+        [os.path.basename(entry), kinds[entry]]
+        for entry in _by_version_descending(kinds)
+    ]
+
+
+def _dists_from_entry(path_item, fullpath, kind):
+    """Yield the distributions of an entry listed by ``_scan_path_item``."""
+    if kind in ('dir', 'file'):
+        # Metadata directories are checked for being empty here, as files
+        # may be added or removed without modifying `path_item`.
+        return distributions_from_metadata(fullpath)
+    elif kind == 'egg':
+        if not _is_egg_path(fullpath):
+            return ()
+        return find_distributions(fullpath)
+    else:
+        return resolve_egg_link(fullpath)
 
-    # for performance, before sorting by version,
-    # screen entries for only those that will yield
-    # distributions
-    filtered = (
-        entry
-        for entry in entries
-        if dist_factory(path_item, entry, only)
-    )
 
-    # scan for .egg and .egg-info in directory
-    path_item_entries = _by_version_descending(filtered)
-    for entry in path_item_entries:
-        fullpath = os.path.join(path_item, entry)
-        factory = dist_factory(path_item, entry, only)
-        for dist in factory(fullpath):
-            yield dist
+class _ScanIndex:
+    """
+    On-disk index of the entries ``find_on_path`` found in each directory.
+
+    Each directory is indexed with its modification time when it was listed,
+    which changes when an entry is added, removed or renamed.  A warm
+    ``import pkg_resources`` thus reads the index and stats each ``sys.path``
+    directory, and only lists again those that changed since.  The index is
+    only kept on disk if ``PKG_RESOURCES_SCAN_INDEX`` names its file.
+    """
+
+    version = 3
+
+    # A directory modified more recently than this may be modified again
+    # without its modification time changing, so its listing isn't kept.
+    racy_seconds = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = None
+        self.entry_points = None
+        self.seen = set()
+        self.dirty = False
+
+    def _load(self):
+        self.dirs = {}
+        self.entry_points = {}
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == self.version:
+            dirs = data.get('dirs')
+            entry_points = data.get('entry_points')
+            if isinstance(dirs, dict) and isinstance(entry_points, dict):
+                self.dirs = dirs
+                self.entry_points = entry_points
+
+    def entries(self, path_item):
+        """Return the entries of ``_scan_path_item(path_item)``"""
+        try:
+            mtime = os.stat(path_item).st_mtime_ns
+        except OSError:
+            return _scan_path_item(path_item)
+        if self.dirs is None:
+            self._load()
+        self.seen.add(path_item)
+        indexed = self.dirs.get(path_item)
+        if indexed is not None and indexed[0] == mtime:
+            return indexed[1]
+        entries = _scan_path_item(path_item)
+        if time.time() - mtime / 1e9 >= self.racy_seconds:
+            self.dirs[path_item] = [mtime, entries]
+            self.dirty = True
+        else:
+            self.dirs.pop(path_item, None)
+        return entries
+
+    def entry_point_sections(self, dist):
+        """
+        Return the lines of each group of the ``entry_points.txt`` of `dist`
+        as a dict, or None if they can't be indexed.
+
+        The file is indexed with its modification time and size, so that its
+        groups don't need to be read again, and only those looked up parsed.
+        """
+        egg_info = getattr(dist._provider, 'egg_info', None)
+        if not isinstance(dist._provider, PathMetadata) or not egg_info:
+            return None
+        path = os.path.join(egg_info, 'entry_points.txt')
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = [st.st_mtime_ns, st.st_size]
+        if self.entry_points is None:
+            self._load()
+        indexed = self.entry_points.get(path)
+        if indexed is not None and indexed[0] == stamp:
+            return indexed[1]
+
+        # Files that EntryPoint.parse_map() would reject are left to it.
+        sections = {}
+        try:
+            for group, lines in split_sections(dist._get_metadata(
+                    'entry_points.txt')):
+                if group is None:
+                    if not lines:
+                        continue
+                    return None
+                group = group.strip()
+                if group in sections:
+                    return None
+                sections[group] = lines
+        except ValueError:
+            return None
+        if time.time() - st.st_mtime_ns / 1e9 >= self.racy_seconds:
+            self.entry_points[path] = [stamp, sections]
+            self.dirty = True
+        return sections
+
+    def save(self):
+        """Write the index, if a directory was listed since it was read"""
+        if not self.dirty or not self.path:
+            return
+        # Directories that weren't looked at are likely gone from sys.path.
+        dirs = {
+            path_item: indexed
+            for path_item, indexed in self.dirs.items()
+            if path_item in self.seen
+        }
+        entry_points = {
+            path: indexed
+            for path, indexed in self.entry_points.items()
+            if os.path.dirname(os.path.dirname(path)) in self.seen
+        }
+        data = {
+            'version': self.version,
+            'dirs': dirs,
+            'entry_points': entry_points,
+        }
+        try:
+            dirname = os.path.dirname(self.path)
+            os.makedirs(dirname, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    'w', encoding='utf-8', dir=dirname, suffix='.tmp',
+                    delete=False) as f:
+                json.dump(data, f)
+            os.replace(f.name, self.path)
+        except OSError:
+            # The index is only an optimization.
+            return
+        self.dirty = False
+
+
+def _get_entry_group(dist, group):
+    """
+    Return ``dist.get_entry_map(group)``, parsing only `group` from the scan
+    index when the entry points of `dist` weren't loaded yet.
+    """
+    if '_ep_map' not in vars(dist):
+        sections = _scan_index.entry_point_sections(dist)
+        if sections is not None:
+            if group not in sections:
+                return {}
+            return EntryPoint.parse_group(group, sections[group], dist)
+    return dist.get_entry_map(group)
+
+
+def _get_scan_index_path():
+    """
+    Return the path of the index of ``sys.path`` directories, given by the
+    ``PKG_RESOURCES_SCAN_INDEX`` environment variable, or None: the index is
+    opt-in, so that importing pkg_resources never writes files by default.
+    """
+    return os.environ.get('PKG_RESOURCES_SCAN_INDEX') or None
+
+
+_scan_index = _ScanIndex(_get_scan_index_path())
 
 
 def dist_factory(path_item, entry, only):
@@ -2572,6 +3055,7 @@ class Distribution:
         self.location = location
         self.precedence = precedence
         self._provider = metadata or empty_provider
+        self._requires_by_extra = {}
 
     @classmethod
     def from_location(cls, location, basename, metadata=None, **kw):
@@ -2697,9 +3181,28 @@ class Distribution:
         try:
             return self.__dep_map
         except AttributeError:
-            self.__dep_map = self._filter_extras(self._build_dep_map())
+            self.__dep_map = {
+                extra: self._requires_for(extra) for extra in self._dep_extras
+            }
         return self.__dep_map
 
+    @property
+    def _dep_lines(self):
+        """
+        A map of extra to the sections of requirement lines naming its
+        (direct) requirements, which are only parsed once the extra is used.
+        """
+        try:
+            return self.__dep_lines
+        except AttributeError:
+            self.__dep_lines = self._filter_extras(self._build_dep_lines())
+        return self.__dep_lines
+
+    @property
+    def _dep_extras(self):
+        """The extras of this distribution, including the null extra"""
+        return self._dep_lines.keys()
+
     @staticmethod
     def _filter_extras(dm):
         """
@@ -2722,21 +3225,39 @@ class Distribution:
             dm.setdefault(new_extra, []).extend(reqs)
         return dm
 
-    def _build_dep_map(self):
+    def _build_dep_lines(self):
         dm = {}
         for name in 'requires.txt', 'depends.txt':
             for extra, reqs in split_sections(self._get_metadata(name)):
-                dm.setdefault(extra, []).extend(parse_requirements(reqs))
+                dm.setdefault(extra, []).append(reqs)
         return dm
 
+    def _requires_for(self, extra):
+        """
+        The (direct) requirements of `extra`, parsed when first needed.
+
+        Raise KeyError if this distribution has no such extra.
+        """
+        try:
+            return self._requires_by_extra[extra]
+        except KeyError:
+            pass
+        if extra is None and None not in self._dep_lines:
+            return []
+        reqs = self._requires_by_extra[extra] = [
+            req
+            for section in self._dep_lines[extra]
+            for req in _parse_shared_requirements(section)
+        ]
+        return reqs
+
     def requires(self, extras=()):
         """List of Requirements needed for this distro if `extras` are used"""
-        dm = self._dep_map
         deps = []
-        deps.extend(dm.get(None, ()))
+        deps.extend(self._requires_for(None))
         for ext in extras:
             try:
-                deps.extend(dm[safe_extra(ext)])
+                deps.extend(self._requires_for(safe_extra(ext)))
             except KeyError as e:
                 raise UnknownExtra(
                     "%s has no such extra feature %r" % (self, ext)
@@ -2970,7 +3491,7 @@ class Distribution:
 
     @property
     def extras(self):
-        return [dep for dep in self._dep_map if dep]
+        return [dep for dep in self._dep_extras if dep]
 
 
 class EggInfoDistribution(Distribution):
@@ -3011,35 +3532,54 @@ class DistInfoDistribution(Distribution):
             return self._pkg_info
 
     @property
-    def _dep_map(self):
+    def _requires_dist(self):
+        """All the Requires-Dist requirements, including their markers"""
         try:
-            return self.__dep_map
+            return self.__requires_dist
         except AttributeError:
-            self.__dep_map = self._compute_dependencies()
-            return self.__dep_map
-
-    def _compute_dependencies(self):
-        """Recompute this distribution's dependencies."""
-        dm = self.__dep_map = {None: []}
+            self.__requires_dist = _parse_shared_requirements(
+                self._parsed_pkg_info.get_all('Requires-Dist') or [])
+            return self.__requires_dist
 
-        reqs = []
-        # Including any condition expressions
-        for req in self._parsed_pkg_info.get_all('Requires-Dist') or []:
-            reqs.extend(parse_requirements(req))
-
-        def reqs_for_extra(extra):
-            for req in reqs:
-                if not req.marker or req.marker.evaluate({'extra': extra}):
-                    yield req
+    @property
+    def _provided_extras(self):
+        """A map of each safe extra name to its name in Provides-Extra"""
+        try:
+            return self.__provided_extras
+        except AttributeError:
+            self.__provided_extras = {
+                safe_extra(extra.strip()): extra
+                for extra in self._parsed_pkg_info.get_all('Provides-Extra') or []
+            }
+            return self.__provided_extras
 
-        common = frozenset(reqs_for_extra(None))
-        dm[None].extend(common)
+    @property
+    def _dep_extras(self):
+        return [None] + list(self._provided_extras)
 
-        for extra in self._parsed_pkg_info.get_all('Provides-Extra') or []:
-            s_extra = safe_extra(extra.strip())
-            dm[s_extra] = list(frozenset(reqs_for_extra(extra)) - common)
+    def _requires_for(self, extra):
+        try:
+            return self._requires_by_extra[extra]
+        except KeyError:
+            pass
+        # Raises KeyError for an extra that isn't provided.
+        name = None if extra is None else self._provided_extras[extra]
+        reqs = [
+            req for req in self._requires_dist
+            if not req.marker or req.marker.evaluate({'extra': name})
+        ]
+        if extra is not None:
+            common = frozenset(self._requires_for(None))
+            reqs = list(frozenset(reqs) - common)
+        else:
+            reqs = list(frozenset(reqs))
+        self._requires_by_extra[extra] = reqs
+        return reqs
 
-        return dm
+    def _compute_dependencies(self):
+        """Recompute this distribution's dependencies."""
+        self._requires_by_extra.clear()
+        return {extra: self._requires_for(extra) for extra in self._dep_extras}
 
 
 _distributionImpl = {
@@ -3067,6 +3607,12 @@ def parse_requirements(strs):
 
     `strs` must be a string, or a (possibly-nested) iterable thereof.
     """
+    for line in _requirement_lines(strs):
+        yield Requirement(line)
+
+
+def _requirement_lines(strs):
+    """Yield the requirement specifications in `strs`, one per line"""
     # create a steppable iterator, so we can handle \-continuations
     lines = iter(yield_lines(strs))
 
@@ -3081,7 +3627,38 @@ def parse_requirements(strs):
                 line += next(lines)
             except StopIteration:
                 return
-        yield Requirement(line)
+        yield line
+
+
+# Requirements parsed from distribution metadata, by specification, so that
+# e.g. the same "six>=1.5" required by many distributions is parsed once.
+# The cache is cleared when it holds _PARSED_REQUIREMENTS_SIZE of them.
+_parsed_requirements = {}
+_PARSED_REQUIREMENTS_SIZE = 4096
+
+
+def _parse_shared_requirements(strs):
+    """
+    Like ``parse_requirements``, but return a list, parsing any identical
+    specification only once.  Each requirement is a copy of its first parse,
+    with its own specs list and specifier set, so that changing it doesn't
+    affect other distributions.  The copies share the marker, the strings
+    and the frozenset of individual specifiers of the specifier set.
+    """
+    reqs = []
+    for line in _requirement_lines(strs):
+        parsed = _parsed_requirements.get(line)
+        if parsed is None:
+            if len(_parsed_requirements) >= _PARSED_REQUIREMENTS_SIZE:
+                _parsed_requirements.clear()
+            parsed = _parsed_requirements[line] = Requirement(line)
+        req = copy.copy(parsed)
+        req.specs = list(parsed.specs)
+        req.specifier = copy.copy(parsed.specifier)
+        req.hashCmp = (
+            parsed.hashCmp[:2] + (req.specifier,) + parsed.hashCmp[3:])
+        reqs.append(req)
+    return reqs
 
 
 class RequirementParseError(packaging.requirements.InvalidRequirement):
@@ -3098,6 +3675,8 @@ class Requirement(packaging.requirements.Requirement):
         self.specs = [
             (spec.operator, spec.version) for spec in self.specifier]
         self.extras = tuple(map(safe_extra, self.extras))
+        # Computed once: requirements changed after parsing, e.g. with their
+        # marker stripped, keep comparing and hashing as parsed.
         self.hashCmp = (
             self.key,
             self.url,
@@ -3276,6 +3855,7 @@ def _initialize_master_working_set():
     working_set.entries = []
     # match order
     list(map(working_set.add_entry, sys.path))
+    _scan_index.save()
     globals().update(locals())
 
 